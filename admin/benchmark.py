@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+"""
+Timings for the performance-sensitive parts of Isomyr.
+
+Run from the top-level source directory, naming the benchmarks to run (or
+none, to run them all):
+
+  $ python admin/benchmark.py physics
+"""
+import os
+import shutil
+import sys
+import tempfile
+from random import Random
+from timeit import default_timer
+
+import pygame
+
+from isomyr import isometric, sprites
+from isomyr.broadphase import AllPairs, SpatialHash
+from isomyr.engine import Responder
+from isomyr.testing.scenes import buildField
+from isomyr.util.atlas import Atlas
+from isomyr.util.loaders import ImageLoader
+from isomyr.util.pack import openPack, packDirectory
+
+
+def timeCall(setup, function, repeat=3):
+    """
+    Returns the best time, in seconds, of calling the function on a fresh
+    result of setup.
+    """
+    best = None
+    for attempt in range(repeat):
+        argument = setup()
+        start = default_timer()
+        function(argument)
+        elapsed = default_timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(label, seconds, baseline=None):
+    line = "  %-40s %10.2f ms" % (label, seconds * 1000)
+    if baseline:
+        line += "  (%.1fx)" % (baseline / seconds)
+    print line
+
+
+def physics():
+    """
+    One physics tick on large scenes: the all-pairs scalar processors against
+    the spatial hash broadphase and the vectorized batch processors.
+    """
+    for count in (300, 1000):
+        print "physics tick, %s objects" % count
+        setup = lambda: buildField(count)
+        responders = [
+            ("scalar, all pairs", Responder(AllPairs())),
+            ("scalar, spatial hash", Responder(SpatialHash(cellSize=32))),
+            ("vectorized batch", Responder(batch=True)),
+            ]
+        baseline = None
+        for label, responder in responders:
+            seconds = timeCall(setup, responder.update, repeat=1)
+            report(label, seconds, baseline)
+            baseline = baseline or seconds
+
+
+def depth():
+    """
+    Depth ordering large scenes for drawing: sorting from scratch, and
+    repairing the last frame's order after a few objects have moved.
+    """
+    for count in (150, 1000):
+        print "depth order, %s objects" % count
+        setup = lambda: buildField(count).objectList
+        baseline = timeCall(setup, isometric.order)
+        report("full sort", baseline)
+
+        def setupMoved():
+            things = setup()
+            sorter = isometric.DepthSorter()
+            sorter.order(things)
+            for thing in things[::50]:
+                thing.location = [thing.location[0] + 3] + thing.location[1:]
+            return sorter, things
+
+        report(
+            "repair, %s moved" % len(range(0, count + 1, 50)),
+            timeCall(setupMoved, lambda x: x[0].order(x[1])), baseline)
+
+
+def draw():
+    """
+    Drawing a frame of sprites, and restoring the background under them,
+    blitting one image at a time against one batched blit per pass.
+    """
+    surface = pygame.Surface((800, 600))
+    background = pygame.Surface((800, 600))
+    image = pygame.Surface((40, 60))
+    for count in (300, 1000):
+        print "draw, %s sprites" % count
+        records = []
+        for index in range(count):
+            record = sprites.RenderRecord()
+            record.setImage(image)
+            record.rect.topleft = ((index * 37) % 760, (index * 23) % 540)
+            records.append(record)
+        order = range(count)
+        restores = [(background, x.rect, x.rect) for x in records]
+        passes = [
+            ("sprites", lambda batched: sprites.ordered_draw(
+                records, order, surface, batched)),
+            ("background", lambda batched: sprites.blit_sequence(
+                surface, restores, batched)),
+            ]
+        for label, function in passes:
+            baseline = timeCall(lambda: False, function)
+            report(label + ", one at a time", baseline)
+            if sprites.BATCHED_BLITS:
+                report(
+                    label + ", batched", timeCall(lambda: True, function),
+                    baseline)
+
+
+def loading():
+    """
+    Loading a glob of images at startup, decoding them one at a time against
+    decoding them on a pool of worker threads.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    random = Random(0)
+    directory = tempfile.mkdtemp()
+    try:
+        for count in (40, 200):
+            print "loading, %s images" % count
+            for index in range(count):
+                image = pygame.Surface((128, 128))
+                for square in range(50):
+                    image.fill(
+                        [random.randint(0, 255) for x in range(3)],
+                        (random.randint(0, 120), random.randint(0, 120), 8, 8))
+                pygame.image.save(
+                    image, os.path.join(directory, "%s-%03d.png" % (
+                        count, index)))
+            baseline = None
+            for workers in (0, 2, 4):
+                loader = ImageLoader(
+                    basedir=directory, workers=workers, cache=None)
+                seconds = timeCall(
+                    lambda: "%s-*.png" % count,
+                    lambda x: loader.load(fileGlob=x))
+                report("%s workers" % workers, seconds, baseline)
+                baseline = baseline or seconds
+    finally:
+        shutil.rmtree(directory)
+
+
+def atlas():
+    """
+    Drawing a frame of sprites from separate images against drawing the same
+    sprites from the regions of a texture atlas.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    random = Random(0)
+    surface = pygame.Surface((800, 600)).convert()
+    images = []
+    for index in range(200):
+        image = pygame.Surface(
+            (random.randint(16, 64), random.randint(16, 64))).convert()
+        image.fill([random.randint(0, 254) for x in range(3)])
+        image.fill((255, 255, 255), (0, 0, 8, 8))
+        image.set_colorkey((255, 255, 255))
+        images.append(image)
+    packed = Atlas()
+    packed.build(images)
+    for count in (1000, 5000):
+        print "draw from atlas, %s sprites" % count
+        places = [(random.randint(0, 760), random.randint(0, 560))
+                  for x in range(count)]
+        baseline = None
+        for label, sprites in [
+                ("separate images", images),
+                ("atlas regions", map(packed.getRegion, images))]:
+            sequence = [(sprites[index % len(sprites)], place)
+                        for index, place in enumerate(places)]
+            seconds = timeCall(lambda: sequence, surface.blits)
+            report(label, seconds, baseline)
+            baseline = baseline or seconds
+
+
+def pack():
+    """
+    Starting up by loading many small images from loose files against
+    loading them from an asset pack, including opening the pack. The files
+    are likely to be in the operating system's cache, so this understates
+    the seeks saved on a truly cold start.
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    random = Random(0)
+    directory = tempfile.mkdtemp()
+    try:
+        assets = os.path.join(directory, "assets")
+        os.mkdir(assets)
+        count = 300
+        print "startup, %s images" % count
+        for index in range(count):
+            image = pygame.Surface((32, 32))
+            image.fill([random.randint(0, 255) for x in range(3)])
+            pygame.image.save(image, os.path.join(assets, "%03d.png" % index))
+        packPath = os.path.join(directory, "assets.pack")
+        packDirectory(assets, packPath)
+
+        def load(assetPack):
+            ImageLoader(basedir=assets, pack=assetPack, cache=None).load(
+                fileGlob="*.png")
+            if assetPack:
+                assetPack.close()
+
+        baseline = timeCall(lambda: None, load)
+        report("loose files", baseline)
+        report("asset pack", timeCall(lambda: openPack(packPath), load),
+               baseline)
+    finally:
+        shutil.rmtree(directory)
+
+
+benchmarks = [
+    ("physics", physics),
+    ("depth", depth),
+    ("draw", draw),
+    ("loading", loading),
+    ("atlas", atlas),
+    ("pack", pack),
+    ]
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:]
+    for name, benchmark in benchmarks:
+        if not names or name in names:
+            benchmark()
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+"""
+Build an asset pack of a game's images, sounds and frame descriptions (see
+isomyr.util.pack), for loaders to read from instead of the loose files.
+
+Run from the top-level source directory, giving the directory of assets and
+the pack to write, and optionally the file name patterns to pack:
+
+  $ python admin/buildPack.py examples/OpenGround openground.pack
+"""
+import sys
+
+from isomyr.util.pack import DEFAULT_PATTERNS, packDirectory
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print __doc__
+        sys.exit(1)
+    directory, packPath = sys.argv[1:3]
+    patterns = sys.argv[3:] or DEFAULT_PATTERNS
+    count = packDirectory(directory, packPath, patterns)
+    print "Packed %s files into %s." % (count, packPath)
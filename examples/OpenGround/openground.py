@@ -8,13 +8,22 @@ from isomyr.engine import Engine
 from isomyr.objects.portal import Portal
 from isomyr.skin import Skin, DirectedAnimatedSkin
 from isomyr.util.loaders import ImageLoader
-from isomyr.thing import PhysicalThing
+from isomyr.thing import ALL_CATEGORIES, CATEGORY_SCENERY, PhysicalThing
 from isomyr.world.world import worldFactory
 
 
 dirname = os.path.dirname(__file__)
 
 
+# The ground and the boundaries of each area never need testing against each
+# other (or against the portals), only against the things moving around on
+# them.
+sceneryMask = ALL_CATEGORIES & ~CATEGORY_SCENERY
+scenery = dict(
+    category=CATEGORY_SCENERY, collisionMask=sceneryMask,
+    touchMask=sceneryMask)
+
+
 # Set the custom keys for the game
 customKeys = Keys(
     left=K_LEFT,
@@ -117,7 +126,8 @@ def loadScene(world, coords):
     image = imageLoader.load(filename=filename)
     scene.setSkin(Skin(image))
     ground = PhysicalThing(
-        "ground", [-1000, -1000, -100], [2000, 2000, 100])
+        name="ground", location=[-1000, -1000, -100], size=[2000, 2000, 100],
+        **scenery)
     scene.addObject(ground)
     map[coords]["scene"] = scene
     return scene
@@ -133,7 +143,8 @@ def connectScene(data):
             toScene=destination, toLocation=[160, 90, 0])
     else:
         connectionN = PhysicalThing(
-            name="boundary", location=[-20, 0, -20], size=[20, 180, 120])
+            name="boundary", location=[-20, 0, -20], size=[20, 180, 120],
+            **scenery)
 
     # East boundary of open area.
     if data.get("E"):
@@ -143,7 +154,8 @@ def connectScene(data):
             toScene=destination, toLocation=[90, 160, 0])
     else:
         connectionE = PhysicalThing(
-            name="boundary", location=[0, -20, -20], size=[180, 20, 120])
+            name="boundary", location=[0, -20, -20], size=[180, 20, 120],
+            **scenery)
 
     # South boundary of open area.
     if data.get("S"):
@@ -153,7 +165,8 @@ def connectScene(data):
             toScene=destination, toLocation=[20, 90, 0])
     else:
         connectionS = PhysicalThing(
-            name="boundary", location=[180, 0, -20], size=[20, 180, 120])
+            name="boundary", location=[180, 0, -20], size=[20, 180, 120],
+            **scenery)
 
     # West boundary of open area.
     if data.get("W"):
@@ -163,7 +176,8 @@ def connectScene(data):
             toScene=destination, toLocation=[90, 20, 0])
     else:
         connectionW = PhysicalThing(
-            name="boundary", location=[0, 180, -20], size=[180, 20, 120])
+            name="boundary", location=[0, 180, -20], size=[180, 20, 120],
+            **scenery)
 
 
     # Add all the connections.
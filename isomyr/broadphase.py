@@ -0,0 +1,509 @@
+"""
+Broadphase searches that find which pairs of objects in a scene are close
+enough for the collision and touch tests to be worth running.
+"""
+
+# How far (in world units) every box is grown before looking for neighbours.
+# The touch test projects one object two units towards the other, so growing
+# both boxes by one unit finds every pair that could possibly touch, as well
+# as every pair that could collide.
+TOUCH_MARGIN = 1
+
+
+def canCollide(thing1, thing2):
+    """
+    Check the collision categories and masks of a pair of objects (see
+    isomyr.thing) to see if they can collide.
+    """
+    return bool(thing1.category & thing2.collisionMask and
+                thing2.category & thing1.collisionMask)
+
+
+def canTouch(thing1, thing2):
+    """
+    Check the collision categories and touch masks of a pair of objects to see
+    if they can touch.
+    """
+    return bool(thing1.category & thing2.touchMask and
+                thing2.category & thing1.touchMask)
+
+
+class Broadphase(object):
+    """
+    The base broadphase class: every object is a neighbour of every other
+    object. Subclasses narrow this down with a spatial index, but must always
+    return a superset of the pairs whose (margin-grown) boxes overlap.
+
+    margin: distance each box is grown by before testing overlaps: integer
+    objectList: the objects indexed by the last build: list of object_3d class
+        or subclass
+    """
+    def __init__(self, margin=TOUCH_MARGIN):
+        self.margin = margin
+        self.objectList = []
+
+    def build(self, objectList):
+        """
+        Index the given objects. Indices used by the other methods are
+        positions in this list.
+        """
+        self.objectList = objectList
+
+    def update(self, index):
+        """
+        Re-index a single object after its location has changed.
+        """
+        pass
+
+    def getBounds(self, index):
+        """
+        Returns the lower and upper corners of the margin-grown box of an
+        object: tuple of two lists of 3 numbers.
+        """
+        thing = self.objectList[index]
+        lower = [thing.location[axis] - self.margin for axis in range(3)]
+        upper = [thing.location[axis] + thing.size[axis] + self.margin
+                 for axis in range(3)]
+        return lower, upper
+
+    def getNeighbours(self, index):
+        """
+        Returns the indices of every object that might collide with or touch
+        the given object: set of integers.
+        """
+        neighbours = set(range(len(self.objectList)))
+        neighbours.discard(index)
+        return neighbours
+
+    def getCandidates(self, index):
+        """
+        Returns the neighbours that come after the given object in the object
+        list, in list order: list of integers.
+        """
+        return sorted([x for x in self.getNeighbours(index) if x > index])
+
+    def getPairs(self):
+        """
+        Returns every candidate pair in the order an all-pairs double loop
+        would visit them: list of (integer, integer) tuples.
+        """
+        pairs = []
+        for index1 in range(len(self.objectList)):
+            for index2 in self.getCandidates(index1):
+                pairs.append((index1, index2))
+        return pairs
+
+
+class AllPairs(Broadphase):
+    """
+    The exhaustive broadphase: tests every pair of objects, exactly like the
+    original double loop in the collision and touch processors.
+    """
+    def getCandidates(self, index):
+        return range(index + 1, len(self.objectList))
+
+
+class SpatialHash(Broadphase):
+    """
+    A uniform grid broadphase. Each object is filed under every grid cell its
+    margin-grown box covers and only objects sharing a cell are neighbours.
+
+    cellSize: the edge length of the cubic grid cells: integer
+    maxCells: objects that would cover more cells than this (the ground, for
+        instance) are kept in a separate list and treated as neighbours of
+        everything: integer
+    """
+    def __init__(self, cellSize=64, maxCells=64, *args, **kwds):
+        super(SpatialHash, self).__init__(*args, **kwds)
+        self.cellSize = cellSize
+        self.maxCells = maxCells
+        self.cells = {}
+        self.objectCells = []
+        self.oversized = set()
+
+    def build(self, objectList):
+        super(SpatialHash, self).build(objectList)
+        self.cells = {}
+        self.objectCells = [None] * len(objectList)
+        self.oversized = set()
+        for index in range(len(objectList)):
+            self.insert(index)
+
+    def getCellRanges(self, index):
+        """
+        Returns the first and last cell coordinate covered by an object on
+        each axis: list of 3 (integer, integer) tuples.
+        """
+        lower, upper = self.getBounds(index)
+        return [(int(lower[axis] // self.cellSize),
+                 int(upper[axis] // self.cellSize)) for axis in range(3)]
+
+    def insert(self, index):
+        ranges = self.getCellRanges(index)
+        cellCount = 1
+        for first, last in ranges:
+            cellCount *= last - first + 1
+        if cellCount > self.maxCells:
+            self.oversized.add(index)
+            self.objectCells[index] = []
+            return
+        (x0, x1), (y0, y1), (z0, z1) = ranges
+        keys = [(x, y, z)
+                for x in range(x0, x1 + 1)
+                for y in range(y0, y1 + 1)
+                for z in range(z0, z1 + 1)]
+        for key in keys:
+            self.cells.setdefault(key, []).append(index)
+        self.objectCells[index] = keys
+
+    def remove(self, index):
+        if index in self.oversized:
+            self.oversized.discard(index)
+            return
+        for key in self.objectCells[index]:
+            cell = self.cells[key]
+            cell.remove(index)
+            if not cell:
+                del self.cells[key]
+        self.objectCells[index] = []
+
+    def update(self, index):
+        self.remove(index)
+        self.insert(index)
+
+    def getNeighbours(self, index):
+        if index in self.oversized:
+            return super(SpatialHash, self).getNeighbours(index)
+        neighbours = set(self.oversized)
+        for key in self.objectCells[index]:
+            neighbours.update(self.cells[key])
+        neighbours.discard(index)
+        return neighbours
+
+
+class Endpoint(object):
+    """
+    One end of an object's interval along a single axis, as kept in the sorted
+    lists of the sweep and prune broadphase.
+
+    thing: the object the interval belongs to: object_3d class or subclass
+    isMin: whether this is the lower end of the interval: boolean
+    value: the coordinate of the end of the interval: number
+    """
+    def __init__(self, thing, isMin):
+        self.thing = thing
+        self.isMin = isMin
+        self.value = 0
+
+    def getKey(self):
+        # Where a lower and an upper end share a coordinate, the upper end
+        # sorts first: the boxes only overlap if they properly intersect.
+        return (self.value, self.isMin)
+
+
+class SweepAndPrune(Broadphase):
+    """
+    A broadphase that keeps, for each axis, a sorted list of the ends of every
+    object's interval. The lists (and the set of overlapping pairs) are kept
+    between builds and brought up to date with an insertion sort, which is
+    close to linear when objects move little from one tick to the next.
+
+    rebuildRatio: when more than this share of the objects are new to the
+        broadphase, the lists are sorted and swept from scratch instead:
+        float
+    """
+    def __init__(self, rebuildRatio=0.5, *args, **kwds):
+        super(SweepAndPrune, self).__init__(*args, **kwds)
+        self.rebuildRatio = rebuildRatio
+        self.endpoints = [[], [], []]
+        # Maps the id of each tracked object to the object, its two
+        # endpoints per axis, and the ids of the objects it overlaps.
+        self.things = {}
+        self.thingEndpoints = {}
+        self.overlapping = {}
+        self.indices = {}
+
+    def build(self, objectList):
+        super(SweepAndPrune, self).build(objectList)
+        self.indices = dict([(id(thing), index)
+                             for index, thing in enumerate(objectList)])
+        removed = [key for key in self.things if key not in self.indices]
+        for key in removed:
+            self.removeThing(key)
+        added = [thing for thing in objectList
+                 if id(thing) not in self.things]
+        for thing in added:
+            self.addThing(thing)
+        for thing in objectList:
+            self.setValues(thing)
+        if len(added) > self.rebuildRatio * len(objectList):
+            self.rebuild()
+        else:
+            for axis in range(3):
+                self.sortAxis(axis)
+
+    def addThing(self, thing):
+        key = id(thing)
+        self.things[key] = thing
+        self.overlapping[key] = set()
+        self.thingEndpoints[key] = []
+        for axis in range(3):
+            pair = (Endpoint(thing, True), Endpoint(thing, False))
+            self.endpoints[axis].extend(pair)
+            self.thingEndpoints[key].append(pair)
+
+    def removeThing(self, key):
+        for other in self.overlapping[key]:
+            self.overlapping[other].discard(key)
+        thing = self.things[key]
+        for axis in range(3):
+            self.endpoints[axis] = [x for x in self.endpoints[axis]
+                                    if x.thing is not thing]
+        del self.things[key]
+        del self.overlapping[key]
+        del self.thingEndpoints[key]
+
+    def setValues(self, thing):
+        lower, upper = self.getBounds(self.indices[id(thing)])
+        for axis, (minimum, maximum) in enumerate(
+            self.thingEndpoints[id(thing)]):
+            minimum.value = lower[axis]
+            maximum.value = upper[axis]
+
+    def overlaps(self, thing1, thing2):
+        """
+        Check whether the intervals of two objects overlap on every axis.
+        """
+        endpoints1 = self.thingEndpoints[id(thing1)]
+        endpoints2 = self.thingEndpoints[id(thing2)]
+        for axis in range(3):
+            minimum1, maximum1 = endpoints1[axis]
+            minimum2, maximum2 = endpoints2[axis]
+            if minimum1.value >= maximum2.value:
+                return False
+            if minimum2.value >= maximum1.value:
+                return False
+        return True
+
+    def addPair(self, thing1, thing2):
+        self.overlapping[id(thing1)].add(id(thing2))
+        self.overlapping[id(thing2)].add(id(thing1))
+
+    def removePair(self, thing1, thing2):
+        self.overlapping[id(thing1)].discard(id(thing2))
+        self.overlapping[id(thing2)].discard(id(thing1))
+
+    def sortAxis(self, axis):
+        """
+        Insertion sort the endpoints along an axis. Every swap of a lower end
+        with an upper end is the moment two intervals start or stop
+        overlapping, and the set of overlapping pairs is updated there.
+        """
+        endpoints = self.endpoints[axis]
+        for index in range(1, len(endpoints)):
+            endpoint = endpoints[index]
+            key = endpoint.getKey()
+            position = index - 1
+            while position >= 0 and endpoints[position].getKey() > key:
+                other = endpoints[position]
+                if endpoint.thing is not other.thing:
+                    if endpoint.isMin and not other.isMin:
+                        if self.overlaps(endpoint.thing, other.thing):
+                            self.addPair(endpoint.thing, other.thing)
+                    elif other.isMin and not endpoint.isMin:
+                        self.removePair(endpoint.thing, other.thing)
+                endpoints[position + 1] = other
+                position -= 1
+            endpoints[position + 1] = endpoint
+
+    def rebuild(self):
+        """
+        Sort every axis from scratch and find the overlapping pairs with a
+        single sweep along the first axis.
+        """
+        for axis in range(3):
+            self.endpoints[axis].sort(key=Endpoint.getKey)
+        for key in self.overlapping:
+            self.overlapping[key] = set()
+        active = []
+        for endpoint in self.endpoints[0]:
+            if endpoint.isMin:
+                for other in active:
+                    if self.overlaps(endpoint.thing, other):
+                        self.addPair(endpoint.thing, other)
+                active.append(endpoint.thing)
+            else:
+                active.remove(endpoint.thing)
+
+    def update(self, index):
+        self.setValues(self.objectList[index])
+        for axis in range(3):
+            self.sortAxis(axis)
+
+    def getNeighbours(self, index):
+        key = id(self.objectList[index])
+        return set([self.indices[x] for x in self.overlapping[key]])
+
+
+class RestIndex(object):
+    """
+    Splits the objects of a scene into those at rest and those that are
+    active, so that pairs of resting objects (walls against floors, furniture
+    that has settled) are not tested against each other every tick.
+
+    A fixed object is at rest as long as it stays where it was on the last
+    tick. Any other object is put to sleep once it has kept still, with zero
+    velocity, for sleepTicks ticks, and wakes as soon as its velocity or
+    location changes. Two resting objects can't start colliding, so such pairs
+    are not collision tested.
+
+    sleepTicks: the number of still ticks before a movable object sleeps:
+        integer
+    """
+    def __init__(self, sleepTicks=10):
+        self.sleepTicks = sleepTicks
+        self.stillTicks = {}
+        self.lastStates = {}
+        self.resting = set()
+
+    def getState(self, thing):
+        return (tuple(thing.location), tuple(thing.size))
+
+    def update(self, objectList):
+        """
+        Work out which objects are resting; called once per tick after the
+        objects have moved and before collisions are processed.
+        """
+        present = set([id(thing) for thing in objectList])
+        for key in list(self.lastStates):
+            if key not in present:
+                self.forget(key)
+        for thing in objectList:
+            key = id(thing)
+            state = self.getState(thing)
+            still = (self.lastStates.get(key) == state and
+                     not any(thing.velocity))
+            self.lastStates[key] = state
+            if not still:
+                self.wake(thing)
+                continue
+            self.stillTicks[key] += 1
+            threshold = self.sleepTicks
+            if thing.fixed is True:
+                threshold = 1
+            if self.stillTicks[key] >= threshold:
+                self.resting.add(key)
+
+    def isResting(self, thing):
+        return id(thing) in self.resting
+
+    def wake(self, thing):
+        """
+        Mark an object as active, e.g. after a collision response moved it.
+        """
+        key = id(thing)
+        self.stillTicks[key] = 0
+        self.resting.discard(key)
+        self.lastStates[key] = self.getState(thing)
+
+    def forget(self, key):
+        self.resting.discard(key)
+        del self.lastStates[key]
+        del self.stillTicks[key]
+
+
+class ContactCache(object):
+    """
+    Keeps the touch results for the pairs of objects in a scene from one tick
+    to the next, so that only the pairs with an object that has moved (or
+    changed size or touch mask) since the last tick need the touch test. The
+    cached contacts are replayed every tick for the touch event handlers,
+    which means that objects standing still against each other cost next to
+    nothing.
+
+    Contacts are keyed on the pair of object ids, in the order the objects
+    come in the scene's object list. If objects are added, removed or
+    reordered, the whole cache is rebuilt.
+
+    contacts: the touching pairs: dictionary mapping (id, id) tuples to
+        Colliders
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.order = []
+        self.states = {}
+        self.contacts = {}
+        # The keys of the contacts recorded for each object id.
+        self.contactKeys = {}
+        # The touching pairs as sorted (index1, index2, Collider) tuples, kept
+        # until the contacts change.
+        self.ordered = None
+
+    def getState(self, thing):
+        return (tuple(thing.location), tuple(thing.size), thing.category,
+                thing.touchMask)
+
+    def update(self, objectList):
+        """
+        Record where the objects are and forget the contacts of the ones that
+        have moved; called once per tick after collisions are processed.
+
+        Returns the indices of the moved objects, whose pairs must be touch
+        tested again.
+        """
+        order = [id(thing) for thing in objectList]
+        if order != self.order:
+            self.clear()
+            self.order = order
+        moved = []
+        for index, thing in enumerate(objectList):
+            key = order[index]
+            state = self.getState(thing)
+            if self.states.get(key) != state:
+                self.states[key] = state
+                self.forgetContacts(key)
+                moved.append(index)
+        return moved
+
+    def forgetContacts(self, key):
+        for contactKey in self.contactKeys.pop(key, ()):
+            del self.contacts[contactKey]
+            for other in contactKey:
+                if other != key:
+                    self.contactKeys[other].discard(contactKey)
+            self.ordered = None
+
+    def getContact(self, thing1, thing2):
+        """
+        Returns the cached touch result for a pair of objects, or None when
+        they are not touching.
+        """
+        return self.contacts.get((id(thing1), id(thing2)))
+
+    def setContact(self, thing1, thing2, imp):
+        """
+        Record the touch result for a pair of objects; only pairs that touch
+        are kept.
+        """
+        if imp.impact is not True:
+            return
+        contactKey = (id(thing1), id(thing2))
+        self.contacts[contactKey] = imp
+        for key in contactKey:
+            self.contactKeys.setdefault(key, set()).add(contactKey)
+        self.ordered = None
+
+    def getContacts(self):
+        """
+        Returns the touching pairs as (index1, index2, Collider) tuples, in
+        the order an all-pairs double loop would find them.
+        """
+        if self.ordered is None:
+            indices = dict([(key, x) for x, key in enumerate(self.order)])
+            self.ordered = sorted([
+                (indices[key1], indices[key2], imp)
+                for (key1, key2), imp in self.contacts.items()],
+                key=lambda x: x[:2])
+        return self.ordered
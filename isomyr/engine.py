@@ -3,6 +3,7 @@ from datetime import datetime
 import pygame
 
 from isomyr import physics
+from isomyr.broadphase import SpatialHash
 from isomyr.config import Keys
 from isomyr.event import (
     notify, PlayerDropItemEvent, PlayerPickUpItemEvent, PlayerUsingItemEvent)
@@ -27,7 +28,26 @@ class Responder(object):
     """
     This is used by the Engine object to give objects in a given scene the
     opportunity to act and react.
+
+    @param broadphase: the search used by the collision and touch processors to
+        find the object pairs worth testing, for scenes that have not chosen
+        their own.
+    @param batch: use the vectorized batch processors, which test every pair
+        of objects at once with NumPy, instead of the broadphase.
+    @param maxCollisionPasses: the most passes the collision processor makes
+        over a scene's objects in one tick, or None for no limit.
+
+    @attrib collisionStats: the work done by the collision processor on the
+        last update, to help find scenes that are slow to resolve.
     """
+    def __init__(self, broadphase=None, batch=False,
+                 maxCollisionPasses=physics.MAX_PASSES):
+        if not broadphase:
+            broadphase = SpatialHash()
+        self.broadphase = broadphase
+        self.batch = batch
+        self.maxCollisionPasses = maxCollisionPasses
+        self.collisionStats = None
 
     def update(self, scene):
         """
@@ -45,12 +65,29 @@ class Responder(object):
         updateGroup = list(scene.objectList)
         for sceneObject in updateGroup:
             sceneObject.respond()
+        # Stop fast moving objects at anything they passed through.
+        physics.sweptCollisionProcessor(scene.objectList)
         # Note: the objects must not modify the object lists or location in
         # their event functions called by the Collision and Touch processors.
-        # Detect collisons.
-        physics.collisionProcessor(scene.objectList)
-        # Detect touches.
-        physics.touchProcessor(scene.objectList)
+        broadphase = scene.getBroadphase() or self.broadphase
+        # Sort out which objects have come to rest.
+        restIndex = scene.getRestIndex()
+        if restIndex:
+            restIndex.update(scene.objectList)
+        contactCache = scene.getContactCache()
+        if self.batch:
+            self.collisionStats = physics.batchCollisionProcessor(
+                scene.objectList, restIndex, self.maxCollisionPasses)
+            physics.batchTouchProcessor(scene.objectList, contactCache)
+        else:
+            # Detect collisons.
+            self.collisionStats = physics.collisionProcessor(
+                scene.objectList, broadphase, restIndex,
+                self.maxCollisionPasses)
+            # Detect touches.
+            physics.touchProcessor(scene.objectList, broadphase, contactCache)
+        # Run the triggers last, once everything has settled.
+        physics.triggerProcessor(scene.objectList)
 
 
 class Engine(object):
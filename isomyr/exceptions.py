@@ -30,6 +30,13 @@ class SkinImageCorrelationMismatchError(IsomyrError):
     """The skin has unequal image counts in different directions."""
 
 
+class UnsupportedProjectionError(IsomyrError):
+    """
+    Only the classic projection can be used to draw a view, as culling and
+    depth sorting assume it.
+    """
+
+
 class EventSubscriberNotFound(IsomyrError):
     """Could not find a subscriber for the given event."""
 
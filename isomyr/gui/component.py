@@ -42,43 +42,58 @@ class TitleView(GUIComponent):
 class SceneView(GUIComponent):
     """
     Draws a scene in an isometric view.
-    """
-
-    def updateRectangle(self, spriteRect):
-        self.parent.changedRectangles = range(len(spriteRect))
-        # XXX what's up here? this probably needs to be refactored
-        for index in range(len(spriteRect)):
-            self.parent.changedRectangles[index] = spriteRect[index]
 
-    def overlayRectangles(self):
-        if len(self.parent.changedRectangles) > 0:
-            background = self.parent.scene.skin.getImage()
-            for clearRect in self.parent.changedRectangles:
-                # pygame.Surface.blit: Draw one image onto another.
-                self.parent.getSurface().blit(
-                    background.subsurface(clearRect), clearRect)
+    @param fullUpdateRatio: the share of the screen which, once changed in a
+        frame, is updated with a full flip rather than by rectangles: float
+    @param projection: the projection the scene is drawn with, which must be
+        the classic one for now (see isometric.checkProjection): Projection
+        class
+
+    @attrib depthSorter: keeps the depth order of the drawn objects between
+        frames: DepthSorter class
+    @attrib changeTracker: finds the parts of the scene that have changed
+        since the last frame, so that only they are drawn: ChangeTracker class
+    @attrib dirtyRegion: the parts of the display to update: DirtyRegion class
+    @attrib culled: the number of objects left out of the last frame for
+        being outside the view: integer
+    """
+    def __init__(self, *args, **kwds):
+        fullUpdateRatio = kwds.pop(
+            "fullUpdateRatio", sprites.FULL_UPDATE_RATIO)
+        projection = kwds.pop("projection", None)
+        # Fail here rather than on the first frame.
+        isometric.checkProjection(projection)
+        super(SceneView, self).__init__(*args, **kwds)
+        self.projection = projection
+        self.depthSorter = isometric.DepthSorter()
+        self.changeTracker = sprites.ChangeTracker()
+        self.dirtyRegion = sprites.DirtyRegion(fullUpdateRatio)
+        self.culled = 0
 
     def updateDisplay(self):
         """
         Updates the isometric display using update rectangles.
         """
-        # Clear the old sprite location with the background.
         scene = self.parent.scene
-        background = scene.skin.getImage()
-        self.overlayRectangles()
-        # Draw the isometric view in the display surface.
-        spriteRect = isometric.viewDraw(
-            scene.world.getSurface(), scene.getUpdatableObjects(),
-            self.parent.displayOffset)
-        # Combines the rectangles that need updating: the new sprites and the
-        # old background rectangles.
-        updateRect = sprites.combine_rectangles(
-            spriteRect, self.parent.changedRectangles)
+        surface = scene.world.getSurface()
+        # Leave out the objects that can't be seen.
+        objects = scene.getUpdatableObjects()
+        visible = isometric.cull(
+            objects, self.parent.displayOffset, surface.get_rect(),
+            self.projection)
+        self.culled = len(objects) - len(visible)
+        # Draw the parts of the isometric view that have changed in the
+        # display surface, over the background.
+        changedRect = isometric.viewDraw(
+            surface, visible, self.parent.displayOffset, self.depthSorter,
+            self.changeTracker, scene.skin.getImage(), scene.getStaticLayer(),
+            self.projection)
         # Update portions of the computer screen.
         # XXX not sure if this should be here or in the View class...
-        pygame.display.update(updateRect)
-        # Remember the sprite rectangles.
-        self.updateRectangle(spriteRect)
+        self.dirtyRegion.add(changedRect, coalesced=True)
+        self.dirtyRegion.update(self.parent.getSurface().get_rect())
+        # Remember the changed rectangles.
+        self.parent.changedRectangles = changedRect
 
     def redrawDisplay(self):
         """
@@ -94,6 +109,10 @@ class SceneView(GUIComponent):
         # XXX maybe this should not be called here, but instead in the
         # top-level view class...
         pygame.display.flip()
+        # Draw every object over the fresh background.
+        self.changeTracker.reset()
+        if scene.getStaticLayer():
+            scene.getStaticLayer().reset()
         self.updateDisplay()
 
 
@@ -1,5 +1,13 @@
+from heapq import heapify, heappop, heappush
+from itertools import chain
+from math import cos, radians, sin
+
+from numpy import array, dot, floor, fromiter, minimum
+import pygame
+
 from isomyr import sprites
-from isomyr.util.vector import addVectors
+from isomyr.exceptions import UnsupportedProjectionError
+from isomyr.skin import AnimatedSkin
 
 
 def newTransform(coord, offset):
@@ -31,30 +39,338 @@ def transform(coord, offset):
     return trans_coord
 
 
-def group_transform(object_group, sprite_group, offset):
+def batchTransform(locations, sizes, offset):
+    """
+    Find where the images of a group of objects go on the screen, all at
+    once: the same projection as transform, with the image's top left corner
+    moved back by the object's y size and up by its z size, as in
+    group_transform.
+
+    @param locations: the objects' locations: NumPy array of shape (n, 3)
+    @param sizes: the objects' sizes: NumPy array of shape (n, 3)
+    @param offset: 2d vector to add to the isometric coordinates: list of 2
+        integers [x, y]
+
+    Returns (left, top): NumPy arrays of n integers
+
+    Locations must be integers, as for transform; NumPy's right shift rounds
+    down like Python's, so the results are exactly those of transform.
+    """
+    x = locations[:, 0]
+    y = locations[:, 1]
+    left = x - y + offset[0] - sizes[:, 1]
+    top = ((x + y) >> 1) - locations[:, 2] + offset[1] - sizes[:, 2]
+    return left, top
+
+
+# Allowance for floating point error when rounding projected coordinates down.
+EPSILON = 1e-9
+
+
+class Projection(object):
+    """
+    A configurable isometric projection. The classic view (the default) puts
+    the x and y axes at 2:1 slopes on the screen; the view can be turned with
+    extra rotations of the world, as prototyped in the sandbox, and the ground
+    flattened or raised by changing the perspective ratio.
+
+    @param roll: rotation about the x axis, in degrees: float
+    @param yaw: rotation about the y axis, in degrees: float
+    @param pitch: rotation about the z axis, in degrees: float
+    @param ratio: the perspective ratio, the screen height of a step along x
+        or y for each unit across; 0.5 for the classic 2:1 view: float
+
+    @attrib matrix: the combined rotation and projection, from world
+        coordinates to screen coordinates: NumPy array of shape (2, 3)
+    @attrib classic: whether this is the classic view, which is projected
+        with the integer code of transform and batchTransform: boolean
+
+    The rotations are applied in the order pitch, yaw, roll, and projected
+    coordinates are rounded down, as in the classic view.
+
+    Culling (cull) and depth sorting (order, screenBounds) assume the classic
+    view, so other views can be used to place images with group_transform
+    but not to draw a scene view; see checkProjection.
+    """
+    def __init__(self, roll=0, yaw=0, pitch=0, ratio=0.5):
+        self.roll = roll
+        self.yaw = yaw
+        self.pitch = pitch
+        self.ratio = ratio
+        self.classic = (roll, yaw, pitch, ratio) == (0, 0, 0, 0.5)
+        self.matrix = self.getMatrix()
+
+    def getMatrix(self):
+        projection = array([
+            [1.0, -1.0, 0.0],
+            [self.ratio, self.ratio, -1.0],
+            ])
+        roll, yaw, pitch = map(radians, [self.roll, self.yaw, self.pitch])
+        rollMatrix = array([
+            [1, 0, 0],
+            [0, cos(roll), -sin(roll)],
+            [0, sin(roll), cos(roll)],
+            ])
+        yawMatrix = array([
+            [cos(yaw), 0, sin(yaw)],
+            [0, 1, 0],
+            [-sin(yaw), 0, cos(yaw)],
+            ])
+        pitchMatrix = array([
+            [cos(pitch), -sin(pitch), 0],
+            [sin(pitch), cos(pitch), 0],
+            [0, 0, 1],
+            ])
+        return dot(projection, dot(rollMatrix, dot(yawMatrix, pitchMatrix)))
+
+    def transform(self, coord, offset):
+        """
+        Project a point onto the screen, like transform.
+
+        Returns a 2d isometric coordinate: list of 2 integers [x, y]
+        """
+        if self.classic:
+            return transform(coord, offset)
+        x, y = floor(dot(self.matrix, coord) + EPSILON).astype(int).tolist()
+        return [x + offset[0], y + offset[1]]
+
+    def batchTransform(self, locations, sizes, offset):
+        """
+        Find where the images of a group of objects go on the screen, like
+        batchTransform: each image's top left corner is put at the leftmost
+        and topmost points of the object's projected box.
+
+        Returns (left, top): NumPy arrays of n integers
+        """
+        if self.classic:
+            return batchTransform(locations, sizes, offset)
+        # The projection is linear, so the box's leftmost and topmost points
+        # come from moving along each axis that takes them left or up.
+        corners = dot(locations, self.matrix.T) + dot(
+            sizes, minimum(self.matrix, 0).T)
+        corners = floor(corners + EPSILON).astype(int)
+        return corners[:, 0] + offset[0], corners[:, 1] + offset[1]
+
+
+def checkProjection(projection):
+    """
+    Make sure a projection can be used to draw a view, raising
+    UnsupportedProjectionError if not. Only the classic projection can: a
+    view drawn with another would be culled and depth sorted as if it were
+    the classic one.
+
+    @param projection: the projection, or None for the classic one:
+        Projection class
+    """
+    if projection is not None and not projection.classic:
+        raise UnsupportedProjectionError
+
+
+def group_transform(object_group, sprite_group, offset, projection=None):
     """
     Calculate the isometric location of an object group.
 
     @param object_group: a list of objects for the 3d coordinates to be
         transformed: list of objects_3d or subclass
-    @param sprite_group: a list of sprites which will be plotted with the
-        isometric coordinates: list of sprites
+    @param sprite_group: the render records of the objects, whose rectangles
+        are moved in place to the isometric coordinates: list of RenderRecord
     @param offset: 2d vector to add to the isometric coordinates: list of 2
         integers [x, y]
+    @param projection: the projection to use instead of the classic one:
+        Projection class
 
     Relies on the same scale system as transform_iso. This is important for
     matching sprite dimensions to object coordinates.
     """
-    for index in range(len(sprite_group)):
-        # Finds the isometric coordinate based on the objects location vector
-        # and a display offset.
-        location = transform(object_group[index].location, offset)
-        # Put the new isometric coordinates of the current object into the
-        # sprite array.
-        sprite_group[index].rect.left = (
-            location[0] - object_group[index].size[1])
-        sprite_group[index].rect.top = (
-            location[1] - object_group[index].size[2])
+    if not sprite_group:
+        return
+    # Find the isometric coordinates of the whole group in one go, from the
+    # objects' location vectors and a display offset.
+    count = len(object_group)
+    locations = fromiter(
+        chain.from_iterable([x.location for x in object_group]), int,
+        3 * count).reshape(count, 3)
+    sizes = fromiter(
+        chain.from_iterable([x.size for x in object_group]), int,
+        3 * count).reshape(count, 3)
+    if projection:
+        left, top = projection.batchTransform(locations, sizes, offset)
+    else:
+        left, top = batchTransform(locations, sizes, offset)
+    # Put the new isometric coordinates of each object into its render
+    # record.
+    for record, x, y in zip(sprite_group, left.tolist(), top.tolist()):
+        record.rect.topleft = (x, y)
+
+
+def cull(object_group, offset, viewRect, projection=None):
+    """
+    Leave out the objects that are drawn wholly outside the view.
+
+    @param object_group: the objects to be displayed: list of objects_3d or
+        subclass
+    @param offset: 2d vector to add to the isometric coordinates: list of 2
+        integers [x, y]
+    @param viewRect: the area of the display that is drawn on: rect
+    @param projection: the view's projection, which must be the classic one
+        (see checkProjection): Projection class
+
+    Returns the objects that may be seen: list of objects_3d or subclass
+
+    Each object is placed as group_transform would place it, with the image
+    it was last drawn with; objects that have not been drawn yet are always
+    kept.
+    """
+    checkProjection(projection)
+    visible = []
+    for thing in object_group:
+        record = thing.renderRecord
+        if record is None or record.image is None:
+            visible.append(thing)
+            continue
+        location = transform(thing.location, offset)
+        width, height = record.image.get_size()
+        if viewRect.colliderect((location[0] - thing.size[1],
+                                 location[1] - thing.size[2], width, height)):
+            visible.append(thing)
+    return visible
+
+
+def screenBounds(thing):
+    """
+    The screen rectangle covered by the isometric projection of an object's
+    box, with no display offset.
+
+    @param thing: the object to project: object_3d or subclass
+
+    Returns (left, top, right, bottom): tuple of 4 integers
+    """
+    x, y, z = thing.location
+    sizeX, sizeY, sizeZ = thing.size
+    left = x - y - sizeY
+    right = x + sizeX - y
+    top = ((x + y) >> 1) - z - sizeZ
+    bottom = ((x + sizeX + y + sizeY) >> 1) - z
+    return (left, top, right, bottom)
+
+
+def inFront(thing1, thing2):
+    """
+    Work out which of two objects is in front of the other, i.e. must be drawn
+    after it.
+
+    Returns 1 if the first object is in front, -1 if the second one is, and 0
+    if their boxes intersect. The first axis (z, then x, then y) on which one
+    box lies wholly past the other decides. Boxes separated on more than one
+    axis in opposite directions can't overlap on the screen, so the choice
+    only matters for matching the original bubble sort, which in effect put
+    an object wholly above another in front of it.
+    """
+    for k in (2, 0, 1):
+        if thing1.location[k] >= thing2.location[k] + thing2.size[k]:
+            return 1
+        if thing2.location[k] >= thing1.location[k] + thing1.size[k]:
+            return -1
+    return 0
+
+
+def depthKey(thing):
+    """
+    A simple depth for an object: the sum of its x, y and z coordinates.
+    Objects further along any axis generally come out in front, and large
+    flat objects such as the ground come out behind what stands on them.
+    """
+    return thing.location[0] + thing.location[1] + thing.location[2]
+
+
+def overlappingPairs(bounds):
+    """
+    Find the pairs of rectangles that overlap, sweeping across them from left
+    to right.
+
+    @param bounds: (left, top, right, bottom) tuples: list
+
+    Returns (index1, index2) tuples: list
+    """
+    pairs = []
+    active = []
+    for index in sorted(range(len(bounds)), key=lambda x: bounds[x][0]):
+        left, top, right, bottom = bounds[index]
+        active = [x for x in active if bounds[x][2] > left]
+        for other in active:
+            if bounds[other][1] < bottom and top < bounds[other][3]:
+                pairs.append((other, index))
+        active.append(index)
+    return pairs
+
+
+def getDependencies(object_group, pairs):
+    """
+    Returns the (behind, front) pairs of object numbers for the given pairs
+    of objects. Objects whose boxes intersect (a door set into a wall, say)
+    are drawn in the order they come in the group, as the original bubble
+    sort left them.
+    """
+    dependencies = []
+    for index1, index2 in pairs:
+        result = inFront(object_group[index1], object_group[index2])
+        if result > 0:
+            dependencies.append((index2, index1))
+        elif result < 0:
+            dependencies.append((index1, index2))
+        else:
+            dependencies.append((min(index1, index2), max(index1, index2)))
+    return dependencies
+
+
+def isOrdered(order, dependencies):
+    """
+    Check that every object comes before the objects in front of it.
+    """
+    position = [0] * len(order)
+    for place, index in enumerate(order):
+        position[index] = place
+    for behind, front in dependencies:
+        if position[behind] > position[front]:
+            return False
+    return True
+
+
+def topologicalOrder(keys, dependencies):
+    """
+    Sort object numbers so that every object comes before the objects in
+    front of it, taking the object with the lowest key whenever there is a
+    choice. Cycles (three long objects overlapping each other, say) are broken
+    at the object with the lowest key.
+
+    @param keys: the sort key of each object: list
+    @param dependencies: (behind, front) pairs of object numbers: list
+    """
+    count = len(keys)
+    inFrontOf = [[] for x in range(count)]
+    waiting = [0] * count
+    for behind, front in dependencies:
+        inFrontOf[behind].append(front)
+        waiting[front] += 1
+    ready = [(keys[x], x) for x in range(count) if not waiting[x]]
+    heapify(ready)
+    done = [False] * count
+    order = []
+    while len(order) < count:
+        if not ready:
+            # Break a cycle.
+            remaining = [(keys[x], x) for x in range(count) if not done[x]]
+            heappush(ready, min(remaining))
+        index = heappop(ready)[1]
+        if done[index]:
+            continue
+        done[index] = True
+        order.append(index)
+        for front in inFrontOf[index]:
+            waiting[front] -= 1
+            if not waiting[front] and not done[front]:
+                heappush(ready, (keys[front], front))
+    return order
 
 
 def order(object_group):
@@ -67,51 +383,382 @@ def order(object_group):
     Returns order: an array of the object numbers in depth order: list of
         integers
 
+    Only objects whose projections overlap on the screen can hide one another,
+    so the "in front of" relation is only worked out for those pairs. Most
+    scenes are ordered correctly by sorting on depthKey, which is tried first;
+    otherwise the relation is sorted topologically.
+
     Note: Under rare conditions this algorithm will not produce a perfect
     representation due to the use of single sprites for any dimension boundary
     box.  This is most obvious when 3 long objects overlap in a three way tie.
     """
-    # Define the array to return with the object number in an isometric order.
-    order = range(len(object_group))
-
-    # Define front precalculate matrix.
-    front = range(len(object_group))
-    #for i in range(3):
-    #    front[i] = range(len(object_group))
-
-    # Precalculate the front location of each objects coordinates.
-    for obj in range(len(object_group)):
-        front[obj] = addVectors(
-            object_group[obj].location, 
-            addVectors(object_group[obj].size, [-1, -1, -1]))
-
-    # Sort the objects, based on x then y then z of the objects being in front
-    # of the other object.
-    for i in range(len(object_group)):
-        for j in range(len(object_group) - 1):
-            for k in range(3):
-                if object_group[order[j]].location[k] > front[order[j+1]][k]:
-                    order[j], order[j+1] = order[j+1], order[j]
-                    break
-    return order
+    return checkedOrder(object_group)[0]
+
+
+def checkedOrder(object_group):
+    """
+    Sorts the objects like order, and also says whether the order is a true
+    one, rather than one that had to break a cycle and so leaves some pair of
+    objects the wrong way round.
+
+    Returns (order, ordered): (list of integers, boolean)
+    """
+    keys = [(depthKey(x), index) for index, x in enumerate(object_group)]
+    pairs = overlappingPairs([screenBounds(x) for x in object_group])
+    dependencies = getDependencies(object_group, pairs)
+    # The fast path.
+    order = sorted(range(len(object_group)), key=keys.__getitem__)
+    if isOrdered(order, dependencies):
+        return order, True
+    order = topologicalOrder(keys, dependencies)
+    return order, isOrdered(order, dependencies)
+
+
+class DepthSorter(object):
+    """
+    Keeps the depth order of a group of objects from one frame to the next, so
+    that only the objects that have moved, or been added, need placing again.
+    The objects that stayed where they were keep their order from the last
+    frame and the others are inserted into it one at a time, each just after
+    the objects it is in front of. If the last order had to break a cycle, the
+    objects are sorted again from scratch, as the order kept from it could
+    still have a pair the wrong way round after the cycle has gone.
+
+    rebuildRatio: the fraction of the objects that may change before the
+        whole group is sorted again from scratch: float
+
+    fullSorts: the number of times the whole group has been sorted: integer
+    ordered: whether the last order was a true one, with no cycle broken:
+        boolean
+    """
+    def __init__(self, rebuildRatio=0.25):
+        self.rebuildRatio = rebuildRatio
+        # The objects in last frame's draw order, and where each one was.
+        self.things = []
+        self.states = {}
+        self.ordered = True
+        self.fullSorts = 0
+
+    def getState(self, thing):
+        return (tuple(thing.location), tuple(thing.size))
+
+    def order(self, object_group):
+        """
+        Sorts the objects into a depth order for drawing, like order.
+
+        Returns order: an array of the object numbers in depth order: list of
+            integers
+        """
+        indices = dict(
+            [(id(x), index) for index, x in enumerate(object_group)])
+        states = dict([(id(x), self.getState(x)) for x in object_group])
+        kept = [x for x in self.things
+                if states.get(id(x), None) == self.states[id(x)]]
+        # The objects moved or added, and those removed.
+        changed = len(object_group) + len(self.things) - 2 * len(kept)
+        if (not self.ordered or
+                changed > self.rebuildRatio * len(object_group)):
+            draw_order = self.sort(object_group)
+        else:
+            draw_order = self.repair(object_group, indices, kept)
+        self.things = [object_group[x] for x in draw_order]
+        self.states = states
+        return draw_order
+
+    def sort(self, object_group):
+        self.fullSorts += 1
+        draw_order, self.ordered = checkedOrder(object_group)
+        return draw_order
+
+    def repair(self, object_group, indices, kept):
+        """
+        Insert the objects that are not in the kept list into it, falling back
+        on a full sort when an object has nowhere to go.
+        """
+        bounds = array([screenBounds(x) for x in object_group])
+        # Each placed object's rank; inserted objects are given ranks between
+        # those of the objects around them.
+        ranks = dict(zip(map(id, kept), range(len(kept))))
+        things = list(kept)
+        for index, thing in enumerate(object_group):
+            if id(thing) in ranks:
+                continue
+            left, top, right, bottom = bounds[index]
+            overlapping = (
+                (bounds[:, 0] < right) & (left < bounds[:, 2]) &
+                (bounds[:, 1] < bottom) & (top < bounds[:, 3])).nonzero()[0]
+            # The ranks of the objects that must come before and after this
+            # one.
+            after = -1
+            before = None
+            for otherIndex in overlapping.tolist():
+                rank = ranks.get(id(object_group[otherIndex]))
+                if rank is None:
+                    # Not placed yet, or this object itself.
+                    continue
+                result = inFront(thing, object_group[otherIndex])
+                if result == 0:
+                    result = cmp(index, otherIndex)
+                if result > 0:
+                    after = max(after, rank)
+                elif before is None or rank < before:
+                    before = rank
+            if before is None:
+                before = after + 2
+            if after >= before:
+                return self.sort(object_group)
+            # Anywhere in the gap will do, as none of the objects in it
+            # overlap this one on the screen.
+            ranks[id(thing)] = (after + before) / 2.0
+            things.append(thing)
+        things.sort(key=lambda x: ranks[id(x)])
+        return [indices[id(x)] for x in things]
 
-def viewDraw(view, object_group, offset):
+
+class StaticLayer(object):
+    """
+    The scene background with the scene's fixed objects drawn over it in depth
+    order. It is kept from frame to frame, and only drawn again when a fixed
+    object is added or removed, so that the moving objects are all that need
+    sorting and drawing on most frames. Fixed objects that move or change
+    their images, such as those with animated skins or a fixed object falling
+    into place, are left out of the layer and drawn along with the moving
+    objects.
+
+    builds: the number of times the layer has been drawn: integer
+    """
+    def __init__(self):
+        self.reset()
+        self.builds = 0
+
+    def reset(self):
+        """
+        Forget the layer, so that it is drawn again on the next update.
+        """
+        self.image = None
+        self.background = None
+        self.things = []
+        self.records = []
+        self.rects = []
+        # The state of each object in the layer, by object id.
+        self.state = {}
+        # The fixed objects found to change, and the state the others had on
+        # the last frame, by object id. The objects are kept with them so
+        # that their ids can't be reused.
+        self.changing = {}
+        self.states = {}
+
+    def getState(self, thing, record):
+        return (tuple(thing.location), tuple(thing.size), record.image,
+                tuple(record.rect))
+
+    def isStatic(self, thing):
+        return (thing.fixed is True and id(thing) not in self.changing and
+                not isinstance(thing.skin, AnimatedSkin))
+
+    def split(self, object_group, sprite_group):
+        """
+        Divide the objects into those drawn in the layer and the others. A
+        fixed object that has moved or changed its image since the last frame
+        is noted as changing, and is one of the others from then on.
+
+        @param object_group: the objects: list of objects_3d or subclass
+        @param sprite_group: their render records, with this frame's images
+            and rectangles: list of RenderRecord
+
+        Returns the objects in the layer and their records, and the others
+        and theirs: tuple of four lists
+        """
+        states = {}
+        static = ([], [])
+        others = ([], [])
+        for thing, record in zip(object_group, sprite_group):
+            if self.isStatic(thing):
+                state = self.getState(thing, record)
+                old = self.states.get(id(thing))
+                if old is None or old[1] == state:
+                    states[id(thing)] = (thing, state)
+                    static[0].append(thing)
+                    static[1].append(record)
+                    continue
+                self.changing[id(thing)] = thing
+            others[0].append(thing)
+            others[1].append(record)
+        self.states = states
+        return static + others
+
+    def update(self, background, object_group, sprite_group):
+        """
+        Draw the layer again if fixed objects have been added to it or
+        removed from it.
+
+        @param background: the scene background: surface
+        @param object_group: the fixed objects: list of objects_3d or subclass
+        @param sprite_group: their render records, with this frame's images
+            and rectangles: list of RenderRecord
+
+        Returns the rectangles of the layer that have changed, an empty list
+            if it was not drawn again, or None if the whole of it has changed
+            (because the background has): list of rect
+        """
+        state = dict([(id(x), self.getState(x, record))
+                      for x, record in zip(object_group, sprite_group)])
+        if background is self.background and state == self.state:
+            return []
+        changed = [pygame.Rect(self.state[x][3]) for x in self.state
+                   if state.get(x) != self.state[x]]
+        changed += [pygame.Rect(state[x][3]) for x in state
+                    if self.state.get(x) != state[x]]
+        if self.background is not None and background is not self.background:
+            changed = None
+        self.state = state
+        self.background = background
+        self.things = list(object_group)
+        self.records = list(sprite_group)
+        self.rects = [x.rect for x in sprite_group]
+        self.image = background.copy()
+        sprites.ordered_draw(self.records, order(object_group), self.image)
+        self.builds += 1
+        return changed
+
+    def isBehind(self, rect, group, position):
+        """
+        Check that none of the fixed objects is in front of a moving object
+        that it overlaps within the rectangle.
+
+        @param group: the moving objects and their render records: list of
+            (object, RenderRecord) tuples
+        @param position: each object's place in the whole group, which
+            decides between objects whose boxes intersect: dict
+        """
+        for thing, record in group:
+            clip = rect.clip(record.rect)
+            for index in clip.collidelistall(self.rects):
+                other = self.things[index]
+                result = inFront(other, thing)
+                if result == 0:
+                    result = cmp(position[id(other)], position[id(thing)])
+                if result > 0:
+                    return False
+        return True
+
+    def draw(self, surface, dirty, things, records, draw_order, position):
+        """
+        Draws the dirty parts of the display: the layer is restored under each
+        dirty rectangle, and the moving objects that meet it drawn over it,
+        clipped, in their depth order. Where a fixed object is in front of a
+        moving one the rectangle is drawn from the background up instead,
+        sorting the moving objects together with just the fixed objects that
+        meet it.
+
+        @param surface: the display area to be drawn into: surface
+        @param dirty: the rectangles to draw again: list of rect
+        @param things: the moving objects: list of objects_3d or subclass
+        @param records: their render records: list of RenderRecord
+        @param draw_order: the moving objects' numbers in depth order: list of
+            integers
+        @param position: each object's place in the whole group: dict
+
+        Returns the dirty rectangles : list of rect
+        """
+        ordered = [(things[x], records[x]) for x in draw_order]
+        rects = [x[1].rect for x in ordered]
+        sequence = []
+        for rect in dirty:
+            group = [ordered[x] for x in sorted(rect.collidelistall(rects))]
+            if self.isBehind(rect, group, position):
+                sequence.append((self.image, rect, rect))
+            else:
+                sequence.append((self.background, rect, rect))
+                group += [(self.things[x], self.records[x])
+                          for x in rect.collidelistall(self.rects)]
+                # Objects with intersecting boxes are left in their group
+                # order.
+                group.sort(key=lambda x: position[id(x[0])])
+                group = [group[x] for x in order([x[0] for x in group])]
+            for thing, record in group:
+                clip = rect.clip(record.rect)
+                sequence.append((
+                    record.image, clip,
+                    clip.move(-record.rect.x, -record.rect.y)))
+        sprites.blit_sequence(surface, sequence)
+        return dirty
+
+
+def viewDraw(view, object_group, offset, depthSorter=None, changeTracker=None,
+             background=None, staticLayer=None, projection=None):
     """ Draw the sprites to the screen based on isometric ordered sorting
 
     @param object_group: a list of objects to be displayed (usually only the
         objects that are visiable)
     @param offset: 2d vector to add to the isometric coordinates: list of 2
         integers [x, y]
+    @param depthSorter: if given, keeps the draw order from the last call and
+        only places the objects that have moved again: DepthSorter class
+    @param changeTracker: if given, only the parts of the view that have
+        changed since the last call are drawn, over the background: the
+        sprites are not cleared first: ChangeTracker class
+    @param background: the image behind the sprites, needed with a
+        changeTracker: surface
+    @param staticLayer: if given along with a changeTracker, the fixed objects
+        are drawn from the layer, and only the others are tracked and sorted
+        (with the depthSorter, if given): StaticLayer class
+    @param projection: the view's projection, which must be the classic one
+        (see checkProjection): Projection class
 
     Returns rect: A list of pygame rectangles where the sprites were
-        drawn : list of rect
+        drawn, or with a changeTracker the rectangles that were drawn
+        again : list of rect
     """
-    # Calculate the isometric order of drawing the sprites from object
-    # information
-    draw_order = order(object_group)
+    checkProjection(projection)
+    if staticLayer and changeTracker:
+        return layeredDraw(
+            view, object_group, offset, changeTracker, background, staticLayer,
+            depthSorter)
     # Put the correct images for all the skins into a sprite group
     sprite_group = sprites.update_images(object_group)
     # Calculate the screen coordinates of the sprites from the object data
     group_transform(object_group, sprite_group, offset)
+    if changeTracker:
+        dirty = changeTracker.update(object_group, sprite_group)
+        if not dirty:
+            return []
+    # Calculate the isometric order of drawing the sprites from object
+    # information
+    if depthSorter:
+        draw_order = depthSorter.order(object_group)
+    else:
+        draw_order = order(object_group)
+    if changeTracker:
+        return sprites.draw_dirty(
+            sprite_group, draw_order, view, background, dirty)
     # Draw sprites in isometric order to the screen
     return sprites.ordered_draw(sprite_group, draw_order, view)
+
+
+def layeredDraw(view, object_group, offset, changeTracker, background,
+                staticLayer, depthSorter=None):
+    """
+    Draw the changed parts of the view over a static layer (see viewDraw).
+    """
+    sprite_group = sprites.update_images(object_group)
+    group_transform(object_group, sprite_group, offset)
+    fixed, fixedRecords, things, records = staticLayer.split(
+        object_group, sprite_group)
+    changed = staticLayer.update(background, fixed, fixedRecords)
+    dirty = changeTracker.update(things, records)
+    if changed is None:
+        # The background has changed, so the whole view is drawn again.
+        dirty = [view.get_rect()]
+    elif changed:
+        # Fixed objects have been added to the layer or taken out of it.
+        dirty = sprites.coalesce_rectangles(dirty + changed)
+    if not dirty:
+        return []
+    if depthSorter:
+        draw_order = depthSorter.order(things)
+    else:
+        draw_order = order(things)
+    position = dict([(id(x), index) for index, x in enumerate(object_group)])
+    return staticLayer.draw(
+        view, dirty, things, records, draw_order, position)
@@ -1,18 +1,23 @@
 from isomyr.event import PlayerTouchPortalEvent, notify
 from isomyr.objects.character import Player
-from isomyr.thing import PhysicalThing
+from isomyr.thing import CATEGORY_PORTAL, Trigger
 
 
-class Portal(PhysicalThing):
+class Portal(Trigger):
     """
     An object which can signal to lead actors for a scene change if they touch
     the portal.
+
+    Portals are triggers subscribed to the player, so they signal once when
+    the player first touches them, and don't stop the player; anything solid
+    about a portal (a wall behind a door, say) should be a separate object.
     """
     def __init__(self, toScene=None, toLocation=None, *args, **kwds):
+        kwds.setdefault("category", CATEGORY_PORTAL)
+        kwds.setdefault("subscribedTypes", (Player,))
         super(Portal, self).__init__(*args, **kwds)
         self.toScene = toScene or self.scene
         self.toLocation = toLocation or [0, 0, 0]
 
-    def eventTouch(self, impact, otherObject, impactSide):
-        if isinstance(otherObject, Player):
-            notify(PlayerTouchPortalEvent(otherObject, self))
+    def eventEnter(self, otherObject):
+        notify(PlayerTouchPortalEvent(otherObject, self))
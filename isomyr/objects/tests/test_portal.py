@@ -0,0 +1,72 @@
+from unittest import TestCase
+
+import pygame
+
+from isomyr import event
+from isomyr.engine import Responder
+from isomyr.objects.character import Player
+from isomyr.objects.portal import Portal
+from isomyr.physics import triggerProcessor
+from isomyr.skin import DirectedAnimatedSkin
+from isomyr.testing.scenes import TickingWorld
+from isomyr.thing import MovableThing, PhysicalThing
+from isomyr.world.world import Scene
+
+
+class PortalTestCase(TestCase):
+
+    def setUp(self):
+        self.scene = Scene(name="hall", world=TickingWorld())
+        self.portal = Portal(
+            name="door", location=[20, 0, 0], size=[10, 30, 56])
+        self.player = Player(
+            name="alice", location=[0, 5, 0], size=[14, 14, 50])
+        self.crate = MovableThing(
+            name="crate", location=[15, 0, 0], size=[10, 10, 10])
+        self.scene.addObjects([self.portal, self.player, self.crate])
+        self.notifications = []
+        self.subscriber = lambda x: self.notifications.append(x)
+        event.subscribe(self.subscriber, event.PlayerTouchPortalEvent)
+
+    def tearDown(self):
+        event.unsubscribe(self.subscriber, event.PlayerTouchPortalEvent)
+
+    def walk(self, steps):
+        for step in range(steps):
+            self.player.location = [self.player.location[0] + 2, 5, 0]
+            triggerProcessor(self.scene.objectList)
+
+    def test_notifiesOnce(self):
+        self.walk(10)
+        self.assertEquals(len(self.notifications), 1)
+        self.assertEquals(self.notifications[0].player, self.player)
+        self.assertEquals(self.notifications[0].newScene, self.portal.toScene)
+
+    def test_notifiesAgainAfterLeaving(self):
+        self.walk(10)
+        self.player.location = [0, 5, 0]
+        self.walk(10)
+        self.assertEquals(len(self.notifications), 2)
+
+    def test_doorInWall(self):
+        # A door set into a wall, as in the TwoRooms example: the wall stops
+        # the player a unit short of the door, which still counts as
+        # touching it.
+        scene = Scene(name="bedroom", world=TickingWorld())
+        door = Portal(name="door", location=[180, 105, 0], size=[10, 30, 56])
+        player = Player(
+            name="alice", location=[151, 110, 0], size=[14, 14, 50])
+        scene.addObjects([
+            PhysicalThing("ground", [-1000, -1000, -100], [2000, 2000, 100]),
+            PhysicalThing("wall", [180, 0, -20], [20, 180, 120]),
+            door, player])
+        image = pygame.Surface((28, 64))
+        player.setSkin(DirectedAnimatedSkin([image], [image]))
+        player.velocity = [2, 0, 0]
+        responder = Responder()
+        for tick in range(20):
+            scene.world.ticks = tick
+            responder.update(scene)
+        self.assertEquals(player.location[0], 165)
+        self.assertEquals(len(self.notifications), 1)
+        self.assertEquals(self.notifications[0].newScene, door.toScene)
@@ -2,12 +2,19 @@
 Collision detection, response and touch detection
 """
 import sys
+from heapq import heapify, heappop, heappush
 from random import randint
 
-from isomyr.thing import FallableThing, PhysicalThing
+from numpy import arange, array, asarray, newaxis, sign, where
+
+from isomyr.broadphase import TOUCH_MARGIN, AllPairs, canCollide, canTouch
+from isomyr.thing import FallableThing, PhysicalThing, Trigger
 from isomyr.util.vector import (
-    addVectors, replaceVector, reverseDirection, divideVectors,
-    multiplyVectors, subtractVectors)
+    addVectors, divideVectors, multiplyVectors, subtractVectors)
+
+
+# The most passes the collision processors make over the objects in a tick.
+MAX_PASSES = 100
 
 
 # XXX Often referred to as imp in the code so perhaps Impact would be a better
@@ -32,6 +39,30 @@ class Collider(object):
         self.impact_time = 0
 
 
+class CollisionStats(object):
+    """
+    Counts the work done by a collision processor over one tick, for spotting
+    scenes where resolving the collisions takes many passes.
+
+    passes: the number of passes made over the objects: integer
+    pairsTested: the number of object pairs collision tested: integer
+    impacts: the number of impacts resolved: integer
+    converged: False if the processor gave up at its maximum number of passes
+        with impacts still to resolve: Boolean
+    """
+
+    def __init__(self):
+        self.passes = 0
+        self.pairsTested = 0
+        self.impacts = 0
+        self.converged = True
+
+    def __repr__(self):
+        return "<CollisionStats passes=%s pairsTested=%s impacts=%s%s>" % (
+            self.passes, self.pairsTested, self.impacts,
+            ("", " unconverged")[not self.converged])
+
+
 def detectCollision(object1, object2):
     """
     Discovers if there is a collision between two objects.
@@ -79,39 +110,480 @@ def detectCollision(object1, object2):
     return imp
 
 
-def collisionProcessor(obj_group):
+def detectCollisions(locations1, sizes1, locations2, sizes2):
+    """
+    A vectorized detectCollision: tests every box in the first set of arrays
+    against the box at the same position in the second set.
+
+    locations1, sizes1, locations2, sizes2: arrays of 3d vectors whose shapes
+        broadcast together: NumPy arrays with a last dimension of 3
+    Returns (impact, impact_time, impactSide_object1, impactSide_object2):
+        arrays with the broadcast shape minus the last dimension, holding the
+        same values detectCollision would put in a Collider.
+    """
+    # How far each face of one box has gone past the opposite face of the
+    # other; the boxes intersect if all of these are positive.
+    impact_time_face1 = locations1 + sizes1 - locations2
+    impact_time_face2 = locations2 + sizes2 - locations1
+    impact = ((impact_time_face1 > 0) & (impact_time_face2 > 0)).all(axis=-1)
+    # The first face impacted on each axis, then over all axes, keeping the
+    # first axis on ties as the scalar routine does.
+    lowFace = impact_time_face1 < impact_time_face2
+    impact_times = where(lowFace, impact_time_face1, impact_time_face2)
+    axes = impact_times.argmin(axis=-1)[..., newaxis]
+    impact_time = take_along_last(impact_times, axes)
+    lowFace = take_along_last(lowFace, axes)
+    impactSide_object1 = (axes[..., 0] << 1) + 1 - lowFace
+    impactSide_object2 = (axes[..., 0] << 1) + lowFace
+    return impact, impact_time, impactSide_object1, impactSide_object2
+
+
+def take_along_last(values, indices):
+    """
+    Pick one element from the last dimension of an array for every position
+    in the other dimensions.
+    """
+    return (values * (arange(values.shape[-1]) == indices)).sum(axis=-1)
+
+
+class CollisionBatch(object):
+    """
+    Packs the locations and sizes of a group of objects into contiguous NumPy
+    arrays, so that the collision and touch tests for every pair can be run in
+    a few vectorized steps. Only the pairs that hit come back to Python, as
+    Colliders.
+
+    obj_group: A list of objects within the scene: list of class or subclass of
+        object_3d
+    rowsPerBlock: the pair matrix is computed this many rows at a time to
+        bound memory use: integer
+
+    pairsTested: a running count of the pairs tested: integer
+    """
+    def __init__(self, obj_group, rowsPerBlock=256):
+        self.obj_group = obj_group
+        self.rowsPerBlock = rowsPerBlock
+        self.pairsTested = 0
+        self.locations = array([x.location for x in obj_group])
+        self.sizes = array([x.size for x in obj_group])
+        self.categories = array([x.category for x in obj_group], dtype=int)
+        self.collisionMasks = array(
+            [x.collisionMask for x in obj_group], dtype=int)
+        self.touchMasks = array([x.touchMask for x in obj_group], dtype=int)
+        if not len(obj_group):
+            self.locations = self.locations.reshape(0, 3)
+            self.sizes = self.sizes.reshape(0, 3)
+
+    def move(self, index):
+        """
+        Copy an object's location into the arrays after it has been moved.
+        """
+        location = array(self.obj_group[index].location)
+        if location.dtype.kind == "f" and self.locations.dtype.kind != "f":
+            self.locations = self.locations.astype(location.dtype)
+        self.locations[index] = location
+
+    def getColliders(self, rows, columns, result):
+        impact, impact_time, side1, side2 = result
+        hits = []
+        for row, column in zip(*impact.nonzero()):
+            imp = Collider()
+            imp.impact = True
+            imp.impact_time = impact_time[row, column].item()
+            imp.impactSide_object1 = side1[row, column].item()
+            imp.impactSide_object2 = side2[row, column].item()
+            hits.append((int(rows[row]), int(columns[column]), imp))
+        return hits
+
+    def getTouchLocations(self, rows, columns):
+        """
+        The locations of the imaginary objects the touch test projects from
+        each row object towards each column object.
+        """
+        centres = self.locations + self.sizes / 2
+        directions = sign(
+            centres[columns][newaxis, :, :] - centres[rows][:, newaxis, :])
+        return self.locations[rows][:, newaxis, :] + directions * 2
+
+    def detect(self, rows, columns, touching=False):
+        """
+        Test every row object against every later column object.
+
+        rows, columns: indices into the object group: sequences of integers
+        touching: run the touch test rather than the collision test: boolean
+        Returns a list of (index1, index2, Collider) tuples, for the pairs
+        that hit, in the order an all-pairs double loop would find them.
+        """
+        rows = asarray(rows, dtype=int)
+        columns = asarray(columns, dtype=int)
+        if not len(rows) or not len(columns):
+            return []
+        if touching:
+            locations1 = self.getTouchLocations(rows, columns)
+        else:
+            locations1 = self.locations[rows][:, newaxis, :]
+        result = detectCollisions(
+            locations1, self.sizes[rows][:, newaxis, :],
+            self.locations[columns][newaxis, :, :],
+            self.sizes[columns][newaxis, :, :])
+        # Only keep the pairs where the column object comes later, and whose
+        # masks let them collide (or touch).
+        later = columns[newaxis, :] > rows[:, newaxis]
+        self.pairsTested += int(later.sum())
+        if touching:
+            masks = self.touchMasks
+        else:
+            masks = self.collisionMasks
+        later &= (
+            (self.categories[rows][:, newaxis] & masks[columns][newaxis, :]
+             != 0) &
+            (self.categories[columns][newaxis, :] & masks[rows][:, newaxis]
+             != 0))
+        result = (result[0] & later,) + result[1:]
+        return self.getColliders(rows, columns, result)
+
+    def detectBlocks(self, rows, columns, hits, touching=False):
+        """
+        Run detect a block of rows at a time, adding the pairs that hit to a
+        dictionary of hits.
+        """
+        rows = asarray(rows, dtype=int)
+        for start in range(0, len(rows), self.rowsPerBlock):
+            block = rows[start:start + self.rowsPerBlock]
+            for index1, index2, imp in self.detect(block, columns, touching):
+                hits.setdefault(index1, []).append((index2, imp))
+        return hits
+
+    def detectAll(self, touching=False):
+        """
+        Test every pair of objects, a block of rows at a time.
+
+        Returns a dictionary mapping the index of the first object of each
+        pair that hit to a list of (index2, Collider) tuples.
+        """
+        indices = arange(len(self.obj_group))
+        return self.detectBlocks(indices, indices, {}, touching)
+
+    def detectInvolving(self, indices, touching=False):
+        """
+        Test every pair of objects that includes at least one of the given
+        objects.
+
+        Returns a dictionary like detectAll.
+        """
+        indices = sorted(indices)
+        others = sorted(set(range(len(self.obj_group))) - set(indices))
+        hits = self.detectBlocks(
+            indices, arange(len(self.obj_group)), {}, touching)
+        self.detectBlocks(others, indices, hits, touching)
+        for row in hits.values():
+            row.sort(key=lambda x: x[0])
+        return hits
+
+    def detectRow(self, index, columns=None):
+        """
+        Collision test one object against later objects (all of them, unless
+        a list of indices is given).
+
+        Returns a list of (index2, Collider) tuples.
+        """
+        if columns is None:
+            columns = arange(index + 1, len(self.obj_group))
+        return [(x[1], x[2]) for x in self.detect([index], columns)]
+
+
+def collisionProcessor(obj_group, broadphase=None, restIndex=None,
+                       maxPasses=MAX_PASSES):
     """
     Detects collisions amongst all object pairs and moves them back until
     just before the collision and runs the object collision responses.
 
     obj_group: A list of objects within the scene: list of class or subclass of
         object_3d
+    broadphase: the search used to find the pairs worth testing; defaults to
+        testing every pair: Broadphase class or subclass
+    restIndex: if given, pairs of resting objects are not tested, and objects
+        moved by a collision response are woken: RestIndex class
+    maxPasses: the most passes to make over the objects before giving up on
+        impacts that keep recurring, or None for no limit: integer
+    Returns the work done: CollisionStats class
+
+    Pairs are visited in the same order as an all-pairs double loop would visit
+    them, and an object is looked up again in the broadphase as soon as a
+    collision response moves it, so the results match the all-pairs search.
+    After the first pass, a pair is only tested again if one of its objects
+    has been moved by a collision response since the pair was last tested.
     """
-    imp = Collider()
+    if broadphase is None:
+        broadphase = AllPairs()
+    stats = CollisionStats()
+    # The objects moved since the last pass; None for the first pass, where
+    # every pair is tested.
+    dirty = None
     #runs the collision routines until no impacts occur.
-    while True:
-        noimpact = True
+    while maxPasses is None or stats.passes < maxPasses:
+        stats.passes += 1
+        broadphase.build(obj_group)
+        if dirty is None:
+            dirty = set(range(len(obj_group)))
+            rows = list(dirty)
+        else:
+            # The rows holding a pair with a moved object.
+            rows = set(dirty)
+            for index in dirty:
+                rows.update([
+                    x for x in broadphase.getNeighbours(index) if x < index])
+            rows = list(rows)
+        heapify(rows)
+        queued = set(rows)
+        moved = set()
+        while rows:
+            object1 = heappop(rows)
+            candidates = broadphase.getCandidates(object1)
+            if object1 not in dirty:
+                candidates = [x for x in candidates if x in dirty]
+            position = 0
+            while position < len(candidates):
+                object2 = candidates[position]
+                position += 1
+                # If both objects are not fixed (or resting) call the
+                # collision detector to get the first object collided with and
+                # time of collision, faces collided with.
+                if not needsCollisionTest(
+                    obj_group[object1], obj_group[object2], restIndex):
+                    continue
+                stats.pairsTested += 1
+                imp = detectCollision(obj_group[object1], obj_group[object2])
+                if imp.impact is False:
+                    continue
+                # Collision response, currently just moving the two objects
+                # apart to just touching.
+                collisionResponse(obj_group[object1], obj_group[object2], imp)
+                obj_group[object1].eventCollision(
+                    obj_group[object2], imp.impactSide_object1)
+                obj_group[object2].eventCollision(
+                    obj_group[object1], imp.impactSide_object2)
+                stats.impacts += 1
+                # Both objects may have moved, so re-index them and look up
+                # the rest of this object's neighbours again.
+                for index in (object1, object2):
+                    if restIndex and obj_group[index].fixed is False:
+                        restIndex.wake(obj_group[index])
+                    broadphase.update(index)
+                    moved.add(index)
+                    dirty.add(index)
+                # Pairs with the second object in the rows still to come now
+                # need testing.
+                for index in [object2] + [
+                    x for x in broadphase.getNeighbours(object2)
+                    if object1 < x < object2]:
+                    if index not in queued:
+                        heappush(rows, index)
+                        queued.add(index)
+                candidates = [
+                    x for x in broadphase.getCandidates(object1)
+                    if x > object2]
+                position = 0
+        if not moved:
+            return stats
+        dirty = moved
+    stats.converged = False
+    return stats
+
+
+def needsCollisionTest(object1, object2, restIndex=None):
+    """
+    Check if a pair of objects can collide: pairs of fixed objects never move
+    and can't, and neither can pairs of resting objects or pairs whose
+    collision masks leave each other out.
+    """
+    if object1.fixed is not False and object2.fixed is not False:
+        return False
+    if not canCollide(object1, object2):
+        return False
+    if (restIndex and restIndex.isResting(object1) and
+        restIndex.isResting(object2)):
+        return False
+    return True
+
+
+def batchCollisionProcessor(obj_group, restIndex=None, maxPasses=MAX_PASSES):
+    """
+    Does the same job as collisionProcessor, using a CollisionBatch to find
+    the colliding pairs.
+
+    The pair matrix is computed once per pass, for the pairs involving an
+    object moved in the last pass (every pair, on the first). Once a collision
+    response has moved some objects, the pairs involving the moved objects are
+    computed again, so the results match the scalar routine.
+
+    obj_group: A list of objects within the scene: list of class or subclass of
+        object_3d
+    restIndex: if given, pairs of resting objects are not responded to, and
+        objects moved by a collision response are woken: RestIndex class
+    maxPasses: the most passes to make over the objects, or None for no limit:
+        integer
+    Returns the work done: CollisionStats class
+    """
+    batch = CollisionBatch(obj_group)
+    stats = CollisionStats()
+    dirty = None
+    while maxPasses is None or stats.passes < maxPasses:
+        stats.passes += 1
+        if dirty is None:
+            hits = batch.detectAll()
+        else:
+            hits = batch.detectInvolving(dirty)
+        moved = set()
         for object1 in range(len(obj_group)):
-            for object2 in range(object1+1, len(obj_group)):
-                # If both objects are not fixed call the collision detector to
-                # get the first object collided with and time of collision,
-                # faces collided with.
-                if (obj_group[object1].fixed is False or
-                    obj_group[object2].fixed is False): 
-                    imp = detectCollision(
-                        obj_group[object1], obj_group[object2])
-                    if imp.impact is True:
-                        # Collision response, currently just moving the two
-                        # objects apart to just touching.
-                        collisionResponse(
-                            obj_group[object1], obj_group[object2], imp)
-                        obj_group[object1].eventCollision(
-                            obj_group[object2], imp.impactSide_object1)
-                        obj_group[object2].eventCollision(
-                            obj_group[object1], imp.impactSide_object2)
-                        noimpact = False
-        if noimpact is True:
-            break 
+            if object1 in moved:
+                row = batch.detectRow(object1)
+            else:
+                row = [x for x in hits.get(object1, []) if x[0] not in moved]
+                later = sorted([x for x in moved if x > object1])
+                if later:
+                    row = sorted(
+                        row + batch.detectRow(object1, later),
+                        key=lambda x: x[0])
+            position = 0
+            while position < len(row):
+                object2, imp = row[position]
+                position += 1
+                if not needsCollisionTest(
+                    obj_group[object1], obj_group[object2], restIndex):
+                    continue
+                collisionResponse(obj_group[object1], obj_group[object2], imp)
+                obj_group[object1].eventCollision(
+                    obj_group[object2], imp.impactSide_object1)
+                obj_group[object2].eventCollision(
+                    obj_group[object1], imp.impactSide_object2)
+                stats.impacts += 1
+                for index in (object1, object2):
+                    batch.move(index)
+                    moved.add(index)
+                    if restIndex and obj_group[index].fixed is False:
+                        restIndex.wake(obj_group[index])
+                row = [x for x in batch.detectRow(object1) if x[0] > object2]
+                position = 0
+        stats.pairsTested = batch.pairsTested
+        if not moved:
+            return stats
+        dirty = moved
+    stats.converged = False
+    return stats
+
+
+def sweep(object1, object2):
+    """
+    Swept collision detection: finds when, along its movement over the last
+    tick, object 1 first ran into object 2 (taken to be standing still at its
+    current location).
+
+    object1: The moving object, which must have a last_location: class or
+        subclass of MovableThing
+    object2: The object it may have run into: class or subclass of object_3d
+    Returns None if there was no impact over the movement, or a tuple of the
+        fraction of the movement completed at impact (a float from 0 up to but
+        not including 1) and the axis of the impact (an integer, 0-2).
+    """
+    entry_time = -1.0
+    exit_time = 1.0
+    impact_axis = None
+    for i in range(3):
+        start = object1.last_location[i]
+        distance = object1.location[i] - start
+        low = object2.location[i] - object1.size[i]
+        high = object2.location[i] + object2.size[i]
+        if distance == 0:
+            # Not moving on this axis, so the objects need to overlap on it
+            # the whole time.
+            if start <= low or start >= high:
+                return None
+            continue
+        # When the object's interval on this axis starts and stops
+        # overlapping the other object's interval.
+        if distance > 0:
+            axis_entry = float(low - start) / distance
+            axis_exit = float(high - start) / distance
+        else:
+            axis_entry = float(high - start) / distance
+            axis_exit = float(low - start) / distance
+        if axis_entry > entry_time:
+            entry_time = axis_entry
+            impact_axis = i
+        exit_time = min(exit_time, axis_exit)
+    # Overlapping at the start is left to the discrete collision detection.
+    if impact_axis is None or entry_time < 0 or entry_time >= exit_time:
+        return None
+    if entry_time >= 1:
+        return None
+    return entry_time, impact_axis
+
+
+def needsSweep(thing):
+    """
+    Check if an object asked for swept collision detection and moved further
+    than its own size along some axis during the last tick.
+    """
+    if not getattr(thing, "continuous", False) or thing.fixed is not False:
+        return False
+    if not thing.last_location:
+        return False
+    for i in range(3):
+        if abs(thing.location[i] - thing.last_location[i]) > thing.size[i]:
+            return True
+    return False
+
+
+def sweptCollisionProcessor(obj_group):
+    """
+    Stops fast moving objects at the first object they ran into during the
+    last tick, rather than letting them pass through it, and runs both
+    objects' collision responses.
+
+    obj_group: A list of objects within the scene: list of class or subclass of
+        object_3d
+
+    Only objects with continuous collision detection turned on and that moved
+    further than their own size are swept; everything else (and any overlap
+    left at the end) is handled by collisionProcessor. The other object is
+    treated as standing still, and the fast object is stopped adjacent to it
+    the way collisionResponse stops an object against a fixed one.
+    """
+    for object1 in obj_group:
+        if not needsSweep(object1):
+            continue
+        first = None
+        for object2 in obj_group:
+            if object2 is object1 or not canCollide(object1, object2):
+                continue
+            hit = sweep(object1, object2)
+            if hit and (first is None or hit[0] < first[0]):
+                first = (hit[0], hit[1], object2)
+        if first is None:
+            continue
+        impact_time, coord, object2 = first
+        # Move the object back along its path to the point of impact, then
+        # set it down next to the face it hit.
+        imp = Collider()
+        imp.impact = True
+        location = list(object1.location)
+        for i in range(3):
+            distance = object1.location[i] - object1.last_location[i]
+            location[i] = (
+                object1.last_location[i] + int(distance * impact_time))
+        if object1.location[coord] > object1.last_location[coord]:
+            imp.impactSide_object1 = coord << 1
+            imp.impactSide_object2 = (coord << 1) + 1
+            location[coord] = (
+                object2.location[coord] - object1.size[coord] - 1)
+        else:
+            imp.impactSide_object1 = (coord << 1) + 1
+            imp.impactSide_object2 = coord << 1
+            location[coord] = object2.location[coord] + object2.size[coord]
+        object1.location = location
+        object1.eventCollision(object2, imp.impactSide_object1)
+        object2.eventCollision(object1, imp.impactSide_object2)
 
 
 def collisionResponse(object1, object2, imp):
@@ -170,24 +642,142 @@ def collisionResponse(object1, object2, imp):
 
 #NOTE: we are using an impact structure for touch which may not be appropriate
 
-def touchProcessor(obj_group):
+def touchProcessor(obj_group, broadphase=None, contactCache=None):
     """
     Discover if any of the objects in the group are touching and call their
     touch response routines.
 
     obj_group: A list of objects within the scene: list of class or subclass of
         object_3d
+    broadphase: the search used to find the pairs worth testing; defaults to
+        testing every pair: Broadphase class or subclass
+    contactCache: if given, only the pairs with an object that has moved since
+        the last call are tested, and the touch responses are run from the
+        cached contacts: ContactCache class
     """
-    for object1 in range(len(obj_group)):
-        for object2 in range(object1+1, len(obj_group)):
+    if broadphase is None:
+        broadphase = AllPairs()
+    if contactCache is None:
+        broadphase.build(obj_group)
+        contacts = []
+        for object1, object2 in broadphase.getPairs():
+            if not canTouch(obj_group[object1], obj_group[object2]):
+                continue
             #Detect a touch between object 1 and object 2
             imp = touch(obj_group[object1], obj_group[object2])
             if imp.impact is True:
-                #Touch response, call the objects touch event handler
-                obj_group[object1].eventTouch(
-                    imp.impact, obj_group[object2], imp.impactSide_object1)
-                obj_group[object2].eventTouch(
-                    imp.impact, obj_group[object1], imp.impactSide_object2) 
+                contacts.append((object1, object2, imp))
+        touchResponses(obj_group, contacts)
+        return
+    moved = contactCache.update(obj_group)
+    if moved:
+        broadphase.build(obj_group)
+        tested = set(moved)
+        for index in moved:
+            for other in broadphase.getNeighbours(index):
+                if other in tested and other < index:
+                    # Already tested from the other object.
+                    continue
+                object1, object2 = sorted((index, other))
+                if not canTouch(obj_group[object1], obj_group[object2]):
+                    continue
+                contactCache.setContact(
+                    obj_group[object1], obj_group[object2],
+                    touch(obj_group[object1], obj_group[object2]))
+    touchResponses(obj_group, contactCache.getContacts())
+
+
+def touchResponses(obj_group, contacts):
+    """
+    Call the touch event handlers of both objects of each touching pair.
+
+    contacts: (index1, index2, Collider) tuples: list
+    """
+    for object1, object2, imp in contacts:
+        #Touch response, call the objects touch event handler
+        obj_group[object1].eventTouch(
+            imp.impact, obj_group[object2], imp.impactSide_object1)
+        obj_group[object2].eventTouch(
+            imp.impact, obj_group[object1], imp.impactSide_object2)
+
+
+def batchTouchProcessor(obj_group, contactCache=None):
+    """
+    Does the same job as touchProcessor, using a CollisionBatch to run the
+    touch test on every pair at once.
+
+    obj_group: A list of objects within the scene: list of class or subclass of
+        object_3d
+    contactCache: if given, only the pairs with an object that has moved since
+        the last call are tested: ContactCache class
+    """
+    if contactCache is None:
+        hits = CollisionBatch(obj_group).detectAll(touching=True)
+        touchResponses(obj_group, [
+            (object1, object2, imp) for object1 in sorted(hits)
+            for object2, imp in hits[object1]])
+        return
+    moved = contactCache.update(obj_group)
+    if moved:
+        hits = CollisionBatch(obj_group).detectInvolving(moved, touching=True)
+        for object1, row in hits.items():
+            for object2, imp in row:
+                contactCache.setContact(
+                    obj_group[object1], obj_group[object2], imp)
+    touchResponses(obj_group, contactCache.getContacts())
+
+
+def triggerProcessor(obj_group):
+    """
+    Work out which objects have entered, stayed in or left each trigger in the
+    group and call the trigger's event handlers.
+
+    obj_group: A list of objects within the scene: list of class or subclass of
+        object_3d
+
+    A trigger is only tested against the objects of its subscribed types.
+    Exits are run before enters and stays.
+    """
+    triggers = [x for x in obj_group if isinstance(x, Trigger)]
+    # The objects of each set of subscribed types.
+    members = {}
+    for trigger in triggers:
+        types = trigger.subscribedTypes
+        if types not in members:
+            members[types] = [x for x in obj_group if isinstance(x, types)]
+        inside = [
+            x for x in members[types]
+            if x is not trigger and isInside(x, trigger)]
+        for thing in trigger.occupants:
+            if thing not in inside:
+                trigger.eventExit(thing)
+        for thing in inside:
+            if thing in trigger.occupants:
+                trigger.eventStay(thing)
+            else:
+                trigger.eventEnter(thing)
+        trigger.occupants = inside
+
+
+def isInside(thing, trigger, margin=TOUCH_MARGIN):
+    """
+    Check if an object is inside, or touching, a trigger. As with the touch
+    test, objects up to a margin apart are touching, so that an object
+    stopped next to a trigger set into a wall (which collisionResponse leaves
+    one unit short of it) still enters the trigger.
+    """
+    for i in range(3):
+        if thing.location[i] > trigger.location[i] + trigger.size[i] + margin:
+            return False
+        if trigger.location[i] > thing.location[i] + thing.size[i] + margin:
+            return False
+    return True
+
+
+# The result of the touch test for objects that are not touching. It is shared
+# between calls so that the test allocates nothing for the common case, and
+# must not be modified.
+NO_CONTACT = Collider()
 
 
 def touch(object1, object2):
@@ -198,25 +788,56 @@ def touch(object1, object2):
 
     imp: a Collider with the impact time and faces touched on both objects:
     class Collider.
+
+    The test projects object 1 two units towards object 2 (along each axis on
+    which their centres differ) and collision detects the projected box with
+    object 2. This is worked out directly from the coordinates, one axis at a
+    time, and nothing is allocated unless the objects touch.
     """
-    # XXX Rewrite this with numpy and vector math.
-    # Produce an imaginary collision object based on projecting object 1 in the
-    # direction of object 2.
-    sense_object1 = PhysicalThing(
-        name="touch sense", location=[0, 0, 0], size=[0, 0, 0])
-    # Take the 2 centres of the objects.
-    centre_object1 = addVectors(
-        object1.location, divideVectors(object1.size, [2, 2, 2]))
-    centre_object2 = addVectors(
-        object2.location, divideVectors(object2.size, [2, 2, 2]))
-    # Find the projected vector between them.
-    project_vector = multiplyVectors(reverseDirection(
-        centre_object1, centre_object2), [2, 2, 2])
-    # Add the projected vector to the first objects location.
-    sense_object1.location = addVectors(object1.location, project_vector)
-    replaceVector(object1.size, sense_object1.size)
-    # Collision detect the sense object with the object 2.
-    imp = detectCollision(sense_object1, object2)
+    location1 = object1.location
+    size1 = object1.size
+    location2 = object2.location
+    size2 = object2.size
+    # Check if the projected box intersects object 2 on every axis.
+    for i in range(3):
+        sense_location = location1[i]
+        centre_object1 = location1[i] + size1[i] / 2
+        centre_object2 = location2[i] + size2[i] / 2
+        if centre_object1 < centre_object2:
+            sense_location += 2
+        elif centre_object1 > centre_object2:
+            sense_location -= 2
+        if sense_location + size1[i] <= location2[i]:
+            return NO_CONTACT
+        if sense_location >= location2[i] + size2[i]:
+            return NO_CONTACT
+    # If intersecting, calculate the first face impacted, as detectCollision
+    # does.
+    imp = Collider()
+    imp.impact = True
+    imp.impact_time = sys.maxint
+    for i in range(3):
+        sense_location = location1[i]
+        centre_object1 = location1[i] + size1[i] / 2
+        centre_object2 = location2[i] + size2[i] / 2
+        if centre_object1 < centre_object2:
+            sense_location += 2
+        elif centre_object1 > centre_object2:
+            sense_location -= 2
+        impact_time_face1 = sense_location + size1[i] - location2[i]
+        impact_time_face2 = location2[i] + size2[i] - sense_location
+        if impact_time_face1 < impact_time_face2:
+            impact_time_coord = impact_time_face1
+            impactSide_object1 = i << 1
+            impactSide_object2 = (i << 1) + 1
+        else:
+            impact_time_coord = impact_time_face2
+            impactSide_object1 = (i << 1) + 1
+            impactSide_object2 = i << 1
+        if impact_time_coord < imp.impact_time:
+            imp.impact_time = impact_time_coord
+            imp.impactSide_object1 = impactSide_object1
+            imp.impactSide_object2 = impactSide_object2
     return imp
 
 
@@ -1,46 +1,182 @@
 import pygame
 
 
+# Whether this version of pygame can blit a sequence of images in one call.
+BATCHED_BLITS = hasattr(pygame.Surface, "blits")
+
+
 #class sprite_group:
 #    def __init__(self, dimension):
 #        self.num_sprites = dimension
 #        self.sprites = range(dimension)
 
+class RenderRecord(object):
+    """
+    The image an object is drawn with and the screen rectangle it is drawn
+    at, in the same attributes as a sprite. Every object keeps one record (see
+    getRenderRecord), which is updated in place on each frame rather than
+    made afresh.
+
+    image: the image to draw: surface
+    rect: where to draw the image: rect
+    """
+    def __init__(self):
+        self.image = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+    def setImage(self, image):
+        """
+        Change the image, resizing the rectangle to match.
+        """
+        if image is not self.image:
+            self.image = image
+            self.rect.size = image.get_size()
+
+
+def getRenderRecord(thing):
+    """
+    Returns an object's render record, making it on first use.
+    """
+    if thing.renderRecord is None:
+        thing.renderRecord = RenderRecord()
+    return thing.renderRecord
+
+
 def update_images(object_group):
     """Updates all the images for every object.
 
     object_group: the objects whose state will be analysed to find the right
         image: list of objects_3d or subclass
-    Returns sprite_group : sprite_group: a list of sprites which hold the new
-        images: list of sprites 
+    Returns sprite_group : sprite_group: the render records of the objects,
+        which hold the new images: list of RenderRecord
     """
     sprite_group = []
     for obj in object_group:
-        sprite = pygame.sprite.Sprite()
-        sprite.image = obj.skin.getImage()
-        sprite.rect = sprite.image.get_rect()
-        sprite_group.append(sprite)
+        record = getRenderRecord(obj)
+        record.setImage(obj.skin.getImage())
+        sprite_group.append(record)
     return sprite_group
 
-def ordered_draw(sprite_group, iso_draw_order, surface):
+def ordered_draw(sprite_group, iso_draw_order, surface, batched=None):
     """
     Draws the sprites to the surface and returns a rect list for surface
     update.
 
-    sprite_group: a list of sprites which will be plotted on the surface: list
-        of sprites
+    sprite_group: a list of render records (or sprites) which will be plotted
+        on the surface: list of RenderRecord
     order: an array of the object numbers in depth order: list of integers
     surface: The pygame display area to be drawn into: surface
-    Returns rect: a list of drawn rectangles for updating : list of rect
+    batched: hand all the sprites to pygame in one call (see blit_sequence)
+        rather than blitting them one at a time; defaults to BATCHED_BLITS:
+        boolean
+    Returns rect: a list of drawn rectangles for updating, in depth order :
+        list of rect
+    """
+    sequence = [
+        (sprite_group[index].image, sprite_group[index].rect)
+        for index in iso_draw_order]
+    return blit_sequence(surface, sequence, batched)
+
+
+def blit_sequence(surface, sequence, batched=None):
     """
-    # XXX This seems kind of convoluted. What about an empty list and appending
-    # to it?
-    rect = range(len(sprite_group))
-    for sp in range(len(sprite_group)):
-        rect[sp] = surface.blit(
-            sprite_group[iso_draw_order[sp]].image,
-            sprite_group[iso_draw_order[sp]].rect)
-    return rect
+    Draw a sequence of images onto a surface, in order.
+
+    surface: the surface to draw on: surface
+    sequence: (image, destination) or (image, destination, area) tuples, as
+        taken by Surface.blit: list
+    batched: use Surface.blits, which draws the whole sequence in one call;
+        defaults to BATCHED_BLITS, and is ignored if pygame is too old to have
+        it: boolean
+    Returns the drawn rectangles: list of rect
+    """
+    if batched is None:
+        batched = BATCHED_BLITS
+    if batched and BATCHED_BLITS:
+        return surface.blits(sequence)
+    return [surface.blit(*x) for x in sequence]
+
+
+def draw_dirty(sprite_group, iso_draw_order, surface, background, dirty,
+               batched=None):
+    """
+    Draws only the dirty parts of the display: the background is restored
+    under each dirty rectangle, and every sprite that meets it is drawn again,
+    in depth order, clipped to the rectangle.
+
+    sprite_group: the render records of the objects: list of RenderRecord
+    iso_draw_order: the object numbers in depth order: list of integers
+    surface: the display area to be drawn into: surface
+    background: the image behind the sprites: surface
+    dirty: the rectangles to draw again, usually from ChangeTracker.update :
+        list of rect
+    Returns the dirty rectangles : list of rect
+
+    Each rectangle is drawn from the background up on its own, so the result
+    is right even where dirty rectangles overlap.
+    """
+    ordered = [sprite_group[index] for index in iso_draw_order]
+    rects = [x.rect for x in ordered]
+    sequence = []
+    for rect in dirty:
+        sequence.append((background, rect, rect))
+        for index in sorted(rect.collidelistall(rects)):
+            record = ordered[index]
+            clip = rect.clip(record.rect)
+            sequence.append((
+                record.image, clip, clip.move(-record.rect.x, -record.rect.y)))
+    blit_sequence(surface, sequence, batched)
+    return dirty
+
+
+class ChangeTracker(object):
+    """
+    Remembers the objects as they were when last drawn, to find the parts of
+    the display that need drawing again: where an object has moved, changed
+    size or image, or been added or removed.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the last frame, so that everything is drawn again.
+        """
+        self.drawn = {}
+
+    def getState(self, thing, record):
+        return (tuple(thing.location), tuple(thing.size), record.image,
+                tuple(record.rect))
+
+    def update(self, object_group, sprite_group):
+        """
+        Compare the objects with the last frame, and remember them for the
+        next.
+
+        object_group: the objects to be drawn: list of objects_3d or subclass
+        sprite_group: their render records, with this frame's images and
+            rectangles: list of RenderRecord
+        Returns the coalesced rectangles of the display that have changed, or
+            an empty list if nothing has : list of rect
+        """
+        drawn = {}
+        dirty = []
+        for thing, record in zip(object_group, sprite_group):
+            state = self.getState(thing, record)
+            # The objects are kept along with their state, so that their ids
+            # can't be reused while they are remembered.
+            old = self.drawn.pop(id(thing), None)
+            drawn[id(thing)] = (thing, state)
+            if old is None:
+                dirty.append(record.rect)
+            elif old[1] != state:
+                dirty.append(pygame.Rect(old[1][3]))
+                dirty.append(record.rect)
+        # Whatever is left was not drawn this frame.
+        for thing, state in self.drawn.values():
+            dirty.append(pygame.Rect(state[3]))
+        self.drawn = drawn
+        return coalesce_rectangles(dirty)
 
 
 def combine_rectangles(sprite_rect, old_rect):
@@ -52,30 +188,144 @@ def combine_rectangles(sprite_rect, old_rect):
     list of old rectangles for updating : list of rect Returns update_rect: the
     combined list of rectangles : list of rect
 
-    The function ensures that if a new object appears or disappears then the
-    old rectangles or new sprites are included in the update and no dirty lines
-    are left on the display.
-    """
-
-    # Case of the rectangle lists being the same length
-    if len(old_rect)>0 and len(old_rect) == len(sprite_rect):
-        update_rect = range(len(sprite_rect))
-        for rect in range(len(sprite_rect)):
-            update_rect[rect] = sprite_rect[rect].union(old_rect[rect])
-    # Case of the old rectangle list is bigger than the sprite rectangle list          
-    elif len(old_rect) > 0 and len(old_rect) > len(sprite_rect):
-        update_rect = range(len(sprite_rect))
-        for rect in range(len(sprite_rect)):
-            update_rect[rect] = sprite_rect[rect].union(old_rect[rect])
-        for rect in range(len(sprite_rect), len(old_rect)):
-            update_rect.append(old_rect[rect])
-    # Case of the old rectangle list is smaller than the sprite rectangle list 
-    elif len(old_rect) > 0 and len(old_rect) < len(sprite_rect):
-        update_rect = range(len(old_rect))
-        for rect in range(len(old_rect)):
-            update_rect[rect] = sprite_rect[rect].union(old_rect[rect])
-        for rect in range(len(old_rect), len(sprite_rect)):
-            update_rect.append(sprite_rect[rect])
-    else:
-        update_rect = sprite_rect
-    return(update_rect)
+    Every old and new rectangle is covered by the result, so that if a new
+    object appears or disappears no dirty lines are left on the display.
+    Rectangles are merged where that does not add to the area to be updated
+    (see coalesce_rectangles), rather than each old rectangle being joined to
+    whichever new one shares its place in the list.
+    """
+    return coalesce_rectangles(list(sprite_rect) + list(old_rect))
+
+
+# The size of the grid squares that coalesce_rectangles files rectangles
+# under, so that each is only compared with those near it.
+COALESCE_CELL_SIZE = 64
+
+
+def coalesce_rectangles(rects, cellSize=COALESCE_CELL_SIZE):
+    """
+    Reduce a list of rectangles to fewer rectangles covering the same pixels.
+
+    Two rectangles are replaced by the one rectangle bounding them both when
+    that is no bigger than the two of them added together: so contained
+    rectangles are dropped, and adjacent ones lined up along an edge, or
+    overlapping by enough, are joined, but rectangles far apart are kept
+    separate. Rectangles that overlap too little for that, such as two
+    meeting at a corner, are also kept separate, and their overlap is drawn
+    and updated twice: cutting it out would leave more, smaller rectangles,
+    which cost more to coalesce and blit. Empty rectangles are dropped.
+
+    Only rectangles that meet or touch can be joined, so each rectangle is
+    filed under the squares of a grid that it covers, edges included, and
+    compared only with the rectangles sharing one of them.
+
+    rects: the rectangles to coalesce : list of rect
+    cellSize: the size of the grid squares : integer
+    Returns the coalesced rectangles : list of rect
+    """
+    pending = [pygame.Rect(x) for x in rects if x.width > 0 and x.height > 0]
+    # The rectangles set aside so far, by number, and the numbers of those
+    # under each grid square.
+    coalesced = {}
+    cells = {}
+    count = 0
+    while pending:
+        rect = pending.pop()
+        keys = get_cells(rect, cellSize)
+        nearby = set()
+        for key in keys:
+            nearby.update(cells.get(key, ()))
+        for index in nearby:
+            other = coalesced[index]
+            union = rect.union(other)
+            if (union.width * union.height <=
+                rect.width * rect.height + other.width * other.height):
+                # The union might now meet rectangles already set aside, so
+                # go round again with it.
+                del coalesced[index]
+                for key in get_cells(other, cellSize):
+                    cells[key].discard(index)
+                pending.append(union)
+                break
+        else:
+            coalesced[count] = rect
+            for key in keys:
+                cells.setdefault(key, set()).add(count)
+            count += 1
+    return [coalesced[x] for x in sorted(coalesced)]
+
+
+def get_cells(rect, cellSize):
+    """
+    Returns the grid squares a rectangle covers, its edges included, so that
+    rectangles which only touch share a square : list of (x, y) tuples
+    """
+    return [(x, y)
+            for x in xrange(rect.left // cellSize, rect.right // cellSize + 1)
+            for y in xrange(rect.top // cellSize, rect.bottom // cellSize + 1)]
+
+
+# The share of the screen that, once dirty, is pushed to the display with a
+# single flip instead of rectangle by rectangle.
+FULL_UPDATE_RATIO = 0.5
+
+
+class DirtyRegion(object):
+    """
+    Collects the rectangles of the display that have changed over a frame, and
+    pushes them to the screen in as few pixels as possible.
+
+    fullUpdateRatio: the share of the screen area which, once dirty, is
+        updated with a full flip rather than by rectangles: float
+    """
+    def __init__(self, fullUpdateRatio=FULL_UPDATE_RATIO):
+        self.fullUpdateRatio = fullUpdateRatio
+        self.rects = []
+        # Whether the rectangles have been coalesced already.
+        self.coalesced = True
+
+    def add(self, rects, coalesced=False):
+        """
+        Mark rectangles of the display as changed.
+
+        coalesced: whether the rectangles are already coalesced (as those
+            from ChangeTracker.update are), so that, if they are all that
+            change over the frame, they need not be coalesced again : boolean
+        """
+        self.coalesced = coalesced and not self.rects
+        self.rects.extend(rects)
+
+    def getRectangles(self, screenRect):
+        """
+        Returns the coalesced dirty rectangles, clipped to the screen.
+        """
+        rects = [screenRect.clip(x) for x in self.rects]
+        if self.coalesced:
+            return [x for x in rects if x.width > 0 and x.height > 0]
+        return coalesce_rectangles(rects)
+
+    def isFull(self, rects, screenRect):
+        """
+        Whether the rectangles cover enough of the screen for a full flip.
+        """
+        area = sum([x.width * x.height for x in rects])
+        screenArea = screenRect.width * screenRect.height
+        return area > self.fullUpdateRatio * screenArea
+
+    def update(self, screenRect):
+        """
+        Push the dirty rectangles to the display and forget them.
+
+        screenRect: the area of the display: rect
+        Returns the rectangles updated, or the whole screen on a full flip :
+            list of rect
+        """
+        rects = self.getRectangles(screenRect)
+        self.rects = []
+        self.coalesced = True
+        if self.isFull(rects, screenRect):
+            pygame.display.flip()
+            return [screenRect]
+        if rects:
+            pygame.display.update(rects)
+        return rects
@@ -0,0 +1,123 @@
+"""
+Scenes for exercising the physics code without a display.
+"""
+from random import Random
+
+from isomyr.engine import Responder
+from isomyr.thing import (
+    FallableThing, MovableThing, PhysicalThing, PortableThing)
+from isomyr.world.world import Scene
+
+
+class TickingWorld(object):
+    """
+    A stand-in for a world that only keeps the game time, which is all the
+    physics event handlers ask of it.
+    """
+    def __init__(self):
+        self.ticks = 0
+
+    def getGameTime(self):
+        return self.ticks
+
+
+def buildRoom(name="room"):
+    """
+    A walled room laid out like the bedroom in the TwoRooms example, with a
+    bed, a guitar and a falling, walking stand-in for the player.
+    """
+    scene = Scene(name=name, world=TickingWorld())
+    scene.addObjects([
+        PhysicalThing("ground", [-1000, -1000, -100], [2000, 2000, 100]),
+        PhysicalThing("wall", [180, 0, -20], [20, 180, 120]),
+        PhysicalThing("wall", [0, 180, -20], [180, 20, 120]),
+        PhysicalThing("wall", [0, -20, -20], [180, 20, 120]),
+        PhysicalThing("wall", [-20, 0, -20], [20, 180, 120]),
+        PhysicalThing(
+            name="door", location=[180, 105, 0], size=[10, 30, 56]),
+        MovableThing(
+            name="bed", location=[0, 100, 0], size=[70, 52, 28],
+            fixed=False),
+        PortableThing(
+            name="guitar", location=[60, 0, 40], size=[20, 12, 20],
+            fixed=False),
+        FallableThing(
+            name="player", location=[90, 90, 100], size=[14, 14, 50],
+            fixed=False),
+        ])
+    scene.getObject("player").velocity = [2, 1, 0]
+    return scene
+
+
+def buildCrowd(count=60, seed=0, name="crowd"):
+    """
+    A walled room filled with randomly placed falling boxes, some of them
+    moving, for stress-testing the collision code.
+    """
+    random = Random(seed)
+    scene = buildRoom(name)
+    for index in range(count):
+        thing = FallableThing(
+            name="box %s" % index,
+            location=[random.randint(0, 160), random.randint(0, 160),
+                      random.randint(0, 200)],
+            size=[random.randint(4, 20), random.randint(4, 20),
+                  random.randint(4, 20)],
+            fixed=False)
+        thing.velocity = [random.randint(-2, 2), random.randint(-2, 2), 0]
+        scene.addObject(thing)
+    return scene
+
+
+def buildField(count=1000, seed=0, name="field"):
+    """
+    A large open scene with boxes spread out over a grid, each jostling a few
+    of its neighbours, for timing the physics on big scenes.
+    """
+    random = Random(seed)
+    scene = Scene(name=name, world=TickingWorld())
+    scene.addObject(
+        PhysicalThing("ground", [-1000, -1000, -100], [8000, 8000, 100]))
+    side = int(count ** 0.5) + 1
+    for index in range(count):
+        thing = FallableThing(
+            name="box %s" % index,
+            location=[(index % side) * 30 + random.randint(0, 8),
+                      (index / side) * 30 + random.randint(0, 8),
+                      random.randint(0, 4)],
+            size=[20, 20, 20], fixed=False)
+        thing.velocity = [random.randint(-2, 2), random.randint(-2, 2), 0]
+        scene.addObject(thing)
+    return scene
+
+
+def snapshot(scene):
+    """
+    Record the physical state of every object in a scene in a form that can
+    be compared between runs.
+    """
+    state = []
+    for thing in scene.objectList:
+        touched = getattr(thing, "touched_objects", [])
+        state.append((
+            thing.name,
+            [int(x) for x in thing.location],
+            [int(x) for x in thing.velocity],
+            [scene.objectList.index(x) for x in touched],
+            list(getattr(thing, "touched_faces", []))))
+    return state
+
+
+def simulate(scene, ticks=50, responder=None):
+    """
+    Run the physics for a scene over a number of ticks, returning a snapshot
+    of the scene after each one.
+    """
+    if not responder:
+        responder = Responder()
+    history = []
+    for tick in range(ticks):
+        scene.world.ticks = tick
+        responder.update(scene)
+        history.append(snapshot(scene))
+    return history
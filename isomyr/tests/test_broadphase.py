@@ -0,0 +1,278 @@
+from unittest import TestCase
+
+from isomyr.broadphase import (
+    AllPairs, ContactCache, RestIndex, SpatialHash, SweepAndPrune, canCollide,
+    canTouch)
+from isomyr.engine import Responder
+from isomyr.testing.scenes import buildCrowd, buildRoom, simulate
+from isomyr.physics import touch
+from isomyr.objects.portal import Portal
+from isomyr.thing import (
+    ALL_CATEGORIES, CATEGORY_SCENERY, MovableThing, PhysicalThing)
+
+
+class CategoryTestCase(TestCase):
+
+    def setUp(self):
+        sceneryMask = ALL_CATEGORIES & ~CATEGORY_SCENERY
+        self.ground = PhysicalThing(
+            name="ground", category=CATEGORY_SCENERY,
+            collisionMask=sceneryMask, touchMask=sceneryMask)
+        self.wall = PhysicalThing(
+            name="wall", category=CATEGORY_SCENERY,
+            collisionMask=sceneryMask, touchMask=sceneryMask)
+        self.box = PhysicalThing(name="box")
+        self.portal = Portal(name="portal")
+
+    def test_defaults(self):
+        self.assertEquals(canCollide(self.box, self.box), True)
+        self.assertEquals(canTouch(self.box, self.box), True)
+
+    def test_scenery(self):
+        self.assertEquals(canCollide(self.ground, self.wall), False)
+        self.assertEquals(canTouch(self.ground, self.wall), False)
+        self.assertEquals(canCollide(self.ground, self.box), True)
+        self.assertEquals(canTouch(self.box, self.wall), True)
+
+    def test_oneSided(self):
+        self.box.touchMask = ALL_CATEGORIES & ~CATEGORY_SCENERY
+        self.assertEquals(canTouch(self.box, self.wall), False)
+        self.assertEquals(canTouch(self.wall, self.box), False)
+        self.assertEquals(canCollide(self.wall, self.box), True)
+
+    def test_portal(self):
+        self.assertEquals(canTouch(self.portal, self.ground), False)
+        self.assertEquals(canTouch(self.portal, self.box), False)
+        self.assertEquals(canCollide(self.portal, self.box), False)
+
+
+class SpatialHashTestCase(TestCase):
+
+    def setUp(self):
+        self.objects = [
+            PhysicalThing("a", [0, 0, 0], [10, 10, 10]),
+            PhysicalThing("b", [11, 0, 0], [10, 10, 10]),
+            PhysicalThing("c", [100, 100, 100], [10, 10, 10]),
+            PhysicalThing("ground", [-1000, -1000, -100], [2000, 2000, 100]),
+            ]
+
+    def test_getNeighbours(self):
+        broadphase = SpatialHash(cellSize=16)
+        broadphase.build(self.objects)
+        self.assertEquals(broadphase.getNeighbours(0), set([1, 3]))
+        self.assertEquals(broadphase.getNeighbours(2), set([3]))
+        self.assertEquals(broadphase.getNeighbours(3), set([0, 1, 2]))
+
+    def test_oversized(self):
+        broadphase = SpatialHash(cellSize=16)
+        broadphase.build(self.objects)
+        self.assertEquals(broadphase.oversized, set([3]))
+
+    def test_update(self):
+        broadphase = SpatialHash(cellSize=16)
+        broadphase.build(self.objects)
+        self.objects[2].location = [5, 5, 5]
+        broadphase.update(2)
+        self.assertEquals(broadphase.getNeighbours(0), set([1, 2, 3]))
+        self.assertEquals(broadphase.getCandidates(0), [1, 2, 3])
+
+    def test_getPairs(self):
+        broadphase = SpatialHash(cellSize=16)
+        broadphase.build(self.objects)
+        self.assertEquals(
+            broadphase.getPairs(), [(0, 1), (0, 3), (1, 3), (2, 3)])
+
+
+class SweepAndPruneTestCase(TestCase):
+
+    def setUp(self):
+        self.objects = [
+            PhysicalThing("a", [0, 0, 0], [10, 10, 10]),
+            PhysicalThing("b", [11, 0, 0], [10, 10, 10]),
+            PhysicalThing("c", [100, 100, 100], [10, 10, 10]),
+            PhysicalThing("ground", [-1000, -1000, -100], [2000, 2000, 100]),
+            ]
+        self.broadphase = SweepAndPrune()
+        self.broadphase.build(self.objects)
+
+    def test_getNeighbours(self):
+        self.assertEquals(self.broadphase.getNeighbours(0), set([1, 3]))
+        self.assertEquals(self.broadphase.getNeighbours(1), set([0, 3]))
+        self.assertEquals(self.broadphase.getNeighbours(2), set())
+        self.assertEquals(self.broadphase.getNeighbours(3), set([0, 1]))
+
+    def test_sortedEndpoints(self):
+        for endpoints in self.broadphase.endpoints:
+            keys = [x.getKey() for x in endpoints]
+            self.assertEquals(keys, sorted(keys))
+
+    def test_buildAfterMoving(self):
+        self.objects[1].location = [13, 0, 0]
+        self.objects[2].location = [5, 5, -20]
+        self.broadphase.build(self.objects)
+        self.assertEquals(self.broadphase.getNeighbours(0), set([3]))
+        self.assertEquals(self.broadphase.getNeighbours(2), set([3]))
+        self.objects[2].location = [5, 5, 5]
+        self.broadphase.build(self.objects)
+        self.assertEquals(self.broadphase.getNeighbours(0), set([2, 3]))
+        self.assertEquals(self.broadphase.getNeighbours(2), set([0, 1]))
+
+    def test_update(self):
+        self.objects[2].location = [5, 5, 5]
+        self.broadphase.update(2)
+        self.assertEquals(self.broadphase.getCandidates(0), [1, 2, 3])
+
+    def test_addAndRemove(self):
+        newcomer = PhysicalThing("d", [15, 5, 5], [2, 2, 2])
+        self.broadphase.build([newcomer] + self.objects[1:])
+        self.assertEquals(self.broadphase.getNeighbours(0), set([1]))
+        self.assertEquals(self.broadphase.getNeighbours(1), set([0, 3]))
+        self.assertEquals(len(self.broadphase.things), 4)
+        self.assertEquals(len(self.broadphase.endpoints[0]), 8)
+
+
+class RestIndexTestCase(TestCase):
+
+    def setUp(self):
+        self.wall = PhysicalThing("wall", [0, 0, 0], [10, 10, 10])
+        self.box = MovableThing(
+            name="box", location=[10, 0, 0], size=[5, 5, 5], fixed=False)
+        self.index = RestIndex(sleepTicks=3)
+
+    def tick(self, count=1):
+        for x in range(count):
+            self.index.update([self.wall, self.box])
+
+    def test_fixedRests(self):
+        self.tick()
+        self.assertEquals(self.index.isResting(self.wall), False)
+        self.tick()
+        self.assertEquals(self.index.isResting(self.wall), True)
+
+    def test_movableSleeps(self):
+        self.tick(3)
+        self.assertEquals(self.index.isResting(self.box), False)
+        self.tick()
+        self.assertEquals(self.index.isResting(self.box), True)
+
+    def test_wakeOnVelocity(self):
+        self.tick(4)
+        self.box.velocity = [1, 0, 0]
+        self.tick()
+        self.assertEquals(self.index.isResting(self.box), False)
+
+    def test_wakeOnLocation(self):
+        self.tick(4)
+        self.box.location = [11, 0, 0]
+        self.tick()
+        self.assertEquals(self.index.isResting(self.box), False)
+        self.assertEquals(self.index.isResting(self.wall), True)
+
+    def test_removedObjectsForgotten(self):
+        self.tick(4)
+        self.index.update([self.wall])
+        self.assertEquals(self.index.isResting(self.box), False)
+        self.assertEquals(self.index.lastStates.keys(), [id(self.wall)])
+
+
+class ContactCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.floor = PhysicalThing("floor", [0, 0, -10], [100, 100, 10])
+        self.box = MovableThing(
+            name="box", location=[10, 10, 0], size=[10, 10, 10], fixed=False)
+        self.objects = [self.floor, self.box]
+        self.cache = ContactCache()
+
+    def test_update(self):
+        self.assertEquals(self.cache.update(self.objects), [0, 1])
+        self.assertEquals(self.cache.update(self.objects), [])
+        self.box.location = [11, 10, 0]
+        self.assertEquals(self.cache.update(self.objects), [1])
+
+    def test_reordered(self):
+        self.cache.update(self.objects)
+        self.cache.setContact(
+            self.floor, self.box, touch(self.floor, self.box))
+        self.objects.reverse()
+        self.assertEquals(self.cache.update(self.objects), [0, 1])
+        self.assertEquals(self.cache.contacts, {})
+
+    def test_getContacts(self):
+        self.cache.update(self.objects)
+        imp = touch(self.floor, self.box)
+        self.cache.setContact(self.floor, self.box, imp)
+        self.assertEquals(self.cache.getContacts(), [(0, 1, imp)])
+        self.assertEquals(self.cache.getContact(self.floor, self.box), imp)
+
+    def test_noContactNotKept(self):
+        self.cache.update(self.objects)
+        self.box.location = [10, 10, 5]
+        self.cache.setContact(
+            self.floor, self.box, touch(self.floor, self.box))
+        self.assertEquals(self.cache.getContacts(), [])
+
+    def test_contactsForgottenOnMove(self):
+        self.cache.update(self.objects)
+        self.cache.setContact(
+            self.floor, self.box, touch(self.floor, self.box))
+        self.box.location = [10, 10, 1]
+        self.cache.update(self.objects)
+        self.assertEquals(self.cache.getContacts(), [])
+        self.assertEquals(self.cache.contactKeys[id(self.floor)], set())
+
+
+class BroadphaseEquivalenceTestCase(TestCase):
+    """
+    The broadphases must not change the outcome of a simulation.
+    """
+    def assertSameSimulation(self, buildScene, broadphase, ticks=40):
+        expected = simulate(buildScene(), ticks, Responder(AllPairs()))
+        result = simulate(buildScene(), ticks, Responder(broadphase))
+        self.assertEquals(result, expected)
+
+    def test_roomSpatialHash(self):
+        self.assertSameSimulation(buildRoom, SpatialHash(cellSize=32))
+
+    def test_crowdSpatialHash(self):
+        self.assertSameSimulation(
+            lambda: buildCrowd(count=30), SpatialHash(cellSize=16))
+
+    def test_roomSweepAndPrune(self):
+        self.assertSameSimulation(buildRoom, SweepAndPrune())
+
+    def test_crowdSweepAndPrune(self):
+        self.assertSameSimulation(
+            lambda: buildCrowd(count=30), SweepAndPrune())
+
+    def test_sceneBroadphase(self):
+        scene = buildRoom()
+        broadphase = SweepAndPrune()
+        scene.setBroadphase(broadphase)
+        simulate(scene, 2, Responder(AllPairs()))
+        self.assertEquals(len(broadphase.things), len(scene.objectList))
+
+    def test_restIndex(self):
+
+        def buildSettlingCrowd(restIndex):
+            scene = buildCrowd(count=30, seed=3)
+            for thing in scene.objectList:
+                thing.velocity = [0, 0, 0]
+            scene.setRestIndex(restIndex)
+            return scene
+
+        expected = simulate(buildSettlingCrowd(None), 60)
+        result = simulate(buildSettlingCrowd(RestIndex(sleepTicks=5)), 60)
+        self.assertEquals(result, expected)
+
+    def test_contactCache(self):
+
+        def buildUncachedCrowd():
+            scene = buildCrowd(count=30, seed=3)
+            scene.setContactCache(None)
+            return scene
+
+        for responder in (Responder, lambda: Responder(batch=True)):
+            expected = simulate(buildUncachedCrowd(), 60, responder())
+            result = simulate(buildCrowd(count=30, seed=3), 60, responder())
+            self.assertEquals(result, expected)
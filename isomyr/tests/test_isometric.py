@@ -1,6 +1,36 @@
+from random import Random
 from unittest import TestCase
 
-from isomyr.isometric import transform
+import pygame
+from numpy import array
+
+from isomyr.engine import Responder
+from isomyr.exceptions import UnsupportedProjectionError
+from isomyr.isometric import (
+    DepthSorter, Projection, StaticLayer, batchTransform, cull,
+    getDependencies, inFront, isOrdered, order, overlappingPairs,
+    screenBounds, topologicalOrder, transform, viewDraw)
+from isomyr.skin import AnimatedSkin, Skin
+from isomyr.sprites import ChangeTracker, ordered_draw, update_images
+from isomyr.testing.scenes import buildCrowd, buildField, buildRoom, simulate
+from isomyr.thing import MovableThing, PhysicalThing
+from isomyr.util.vector import addVectors
+
+
+def referenceOrder(object_group):
+    """
+    The original bubble sort.
+    """
+    order = range(len(object_group))
+    front = [addVectors(x.location, addVectors(x.size, [-1, -1, -1]))
+             for x in object_group]
+    for i in range(len(object_group)):
+        for j in range(len(object_group) - 1):
+            for k in range(3):
+                if object_group[order[j]].location[k] > front[order[j+1]][k]:
+                    order[j], order[j+1] = order[j+1], order[j]
+                    break
+    return order
 
 
 class IsometricTransformTestCase(TestCase):
@@ -20,3 +50,340 @@ class IsometricTransformTestCase(TestCase):
         self.assertEquals(transform([-100, -100, -100], [0, 1]), [0, 1])
         self.assertEquals(transform([-2, -4, -8], [1, 0]), [3, 5])
         self.assertEquals(transform([-30, -50, -70], [1, 1]), [21, 31])
+
+    def test_batchTransform(self):
+        random = Random(0)
+        locations = [[random.randint(-500, 500) for x in range(3)]
+                     for thing in range(200)]
+        sizes = [[random.randint(1, 50) for x in range(3)]
+                 for thing in range(200)]
+        left, top = batchTransform(array(locations), array(sizes), [202, 182])
+        for index in range(200):
+            x, y = transform(locations[index], [202, 182])
+            self.assertEquals(left[index], x - sizes[index][1])
+            self.assertEquals(top[index], y - sizes[index][2])
+
+    def test_projection(self):
+        random = Random(0)
+        locations = [[random.randint(-500, 500) for x in range(3)]
+                     for thing in range(200)]
+        sizes = [[random.randint(1, 50) for x in range(3)]
+                 for thing in range(200)]
+        projection = Projection()
+        self.assertTrue(projection.classic)
+        # The matrix gives the same results as the integer code.
+        projection.classic = False
+        for location in locations:
+            self.assertEquals(
+                projection.transform(location, [1, 2]),
+                transform(location, [1, 2]))
+        left, top = projection.batchTransform(
+            array(locations), array(sizes), [202, 182])
+        expected = batchTransform(array(locations), array(sizes), [202, 182])
+        self.assertEquals(left.tolist(), expected[0].tolist())
+        self.assertEquals(top.tolist(), expected[1].tolist())
+
+    def test_customProjection(self):
+        projection = Projection(ratio=1)
+        self.assertFalse(projection.classic)
+        self.assertEquals(projection.transform([10, 4, 3], [0, 0]), [6, 11])
+        # A quarter turn puts the x axis where the y axis was.
+        projection = Projection(pitch=90)
+        self.assertEquals(projection.transform([10, 0, 0], [0, 0]), [-10, 5])
+        self.assertEquals(projection.transform([0, 10, 0], [0, 0]), [-10, -5])
+        left, top = projection.batchTransform(
+            array([[0, 0, 0]]), array([[10, 10, 10]]), [0, 0])
+        self.assertEquals((left[0], top[0]), (-20, -15))
+
+    def test_viewProjection(self):
+        # A view can't be drawn with a projection that culling and depth
+        # sorting would disagree with.
+        surface = pygame.Surface((100, 100))
+        things = [PhysicalThing(
+            name="box", location=[0, 0, 0], size=[10, 10, 10],
+            skin=Skin([pygame.Surface((20, 20))]))]
+        viewDraw(surface, things, [50, 50], projection=Projection())
+        self.assertRaises(
+            UnsupportedProjectionError, viewDraw, surface, things, [50, 50],
+            projection=Projection(pitch=90))
+        self.assertRaises(
+            UnsupportedProjectionError, cull, things, [50, 50],
+            surface.get_rect(), Projection(ratio=1))
+
+
+class DepthOrderTestCase(TestCase):
+
+    def setUp(self):
+        self.floor = PhysicalThing(
+            name="floor", location=[0, 0, -10], size=[100, 100, 10])
+        self.box = PhysicalThing(
+            name="box", location=[10, 10, 0], size=[10, 10, 10])
+        self.far = PhysicalThing(
+            name="far", location=[500, -500, 0], size=[10, 10, 10])
+
+    def test_screenBounds(self):
+        left, top = transform(self.box.location, [0, 0])
+        self.assertEquals(
+            screenBounds(self.box),
+            (left - 10, top - 10, left + 10, top + 10))
+
+    def test_inFront(self):
+        self.assertEquals(inFront(self.box, self.floor), 1)
+        self.assertEquals(inFront(self.floor, self.box), -1)
+        self.assertEquals(inFront(self.box, self.box), 0)
+
+    def test_overlappingPairs(self):
+        bounds = [screenBounds(x) for x in (self.floor, self.box, self.far)]
+        self.assertEquals(overlappingPairs(bounds), [(0, 1)])
+
+    def test_order(self):
+        self.assertEquals(order([self.box, self.far, self.floor]), [2, 1, 0])
+
+    def test_cycle(self):
+        self.assertEquals(
+            topologicalOrder([3, 2, 1], [(0, 1), (1, 2), (2, 0)]), [2, 0, 1])
+
+    def assertMatchesReference(self, scene):
+        """
+        Objects whose projections overlap must be drawn in the same order as
+        the original bubble sort drew them.
+        """
+        simulate(scene, 20)
+        things = scene.objectList
+        expected = referenceOrder(things)
+        result = order(things)
+        self.assertEquals(sorted(result), range(len(things)))
+        position = dict([(x, place) for place, x in enumerate(expected)])
+        for behind, front in getDependencies(
+            things, overlappingPairs([screenBounds(x) for x in things])):
+            self.assertTrue(position[behind] < position[front])
+            self.assertTrue(result.index(behind) < result.index(front))
+
+    def test_room(self):
+        self.assertMatchesReference(buildRoom())
+
+    def test_crowd(self):
+        self.assertMatchesReference(buildCrowd(count=40, seed=4))
+
+    def test_field(self):
+        self.assertMatchesReference(buildField(count=100))
+
+
+class DepthSorterTestCase(TestCase):
+
+    def setUp(self):
+        self.scene = buildField(count=100)
+        # Only a few of the boxes keep moving once they have settled.
+        for index, thing in enumerate(self.scene.objectList):
+            if index % 20:
+                thing.velocity = [0, 0, 0]
+        self.sorter = DepthSorter()
+        self.responder = Responder()
+
+    def assertOrdered(self, result):
+        things = self.scene.objectList
+        self.assertEquals(sorted(result), range(len(things)))
+        dependencies = getDependencies(
+            things, overlappingPairs([screenBounds(x) for x in things]))
+        self.assertTrue(isOrdered(result, dependencies))
+
+    def tick(self, count=1):
+        for tick in range(count):
+            self.scene.world.ticks += 1
+            self.responder.update(self.scene)
+            self.assertOrdered(self.sorter.order(self.scene.objectList))
+
+    def test_repair(self):
+        self.tick(20)
+        fullSorts = self.sorter.fullSorts
+        self.tick(20)
+        self.assertEquals(self.sorter.fullSorts, fullSorts)
+
+    def test_unchanged(self):
+        self.tick(20)
+        expected = self.sorter.order(self.scene.objectList)
+        self.assertEquals(self.sorter.order(self.scene.objectList), expected)
+
+    def test_addAndRemove(self):
+        self.tick(20)
+        fullSorts = self.sorter.fullSorts
+        self.scene.objectList.pop(30)
+        self.scene.addObject(self.scene.objectList.pop(10))
+        self.tick()
+        self.assertEquals(self.sorter.fullSorts, fullSorts)
+
+    def test_rebuild(self):
+        self.tick(20)
+        fullSorts = self.sorter.fullSorts
+        for thing in self.scene.objectList[:50]:
+            thing.location = [thing.location[0] + 5] + thing.location[1:]
+        self.assertOrdered(self.sorter.order(self.scene.objectList))
+        self.assertEquals(self.sorter.fullSorts, fullSorts + 1)
+
+    def test_brokenCycle(self):
+        # Three rods, each in front of the next, so that one pair has to be
+        # drawn the wrong way round.
+        rods = [
+            PhysicalThing(name="x rod", location=[10, 15, 5],
+                          size=[40, 10, 10]),
+            PhysicalThing(name="y rod", location=[0, 5, 20],
+                          size=[10, 40, 10]),
+            PhysicalThing(name="z rod", location=[0, 15, 10],
+                          size=[10, 10, 40])]
+        self.sorter.order(rods)
+        self.assertFalse(self.sorter.ordered)
+        # Nothing has moved, but the last order is not kept.
+        self.sorter.order(rods)
+        self.assertEquals(self.sorter.fullSorts, 2)
+        rods[2].location[0] += 100
+        result = self.sorter.order(rods)
+        self.assertTrue(self.sorter.ordered)
+        dependencies = getDependencies(
+            rods, overlappingPairs([screenBounds(x) for x in rods]))
+        self.assertTrue(isOrdered(result, dependencies))
+
+
+class CullTestCase(TestCase):
+
+    def setUp(self):
+        self.offset = [100, 50]
+        self.view = pygame.Rect(0, 0, 200, 150)
+        image = pygame.Surface((40, 40))
+        self.things = [
+            PhysicalThing(
+                name="box %s" % index, location=location, size=[20, 20, 20],
+                skin=Skin([image]))
+            for index, location in enumerate([
+                [0, 0, 0], [200, 0, 0], [0, 200, 0], [-100, -100, 0],
+                [110, 0, 0], [0, 0, -200]])]
+
+    def test_cull(self):
+        # Nothing is left out until it has been drawn once.
+        self.assertEquals(
+            cull(self.things, self.offset, self.view), self.things)
+        update_images(self.things)
+        visible = cull(self.things, self.offset, self.view)
+        self.assertEquals([x.name for x in visible], ["box 0", "box 4"])
+        # The box above the view is kept once its image is tall enough to
+        # reach into it.
+        self.things[3].skin.images = [pygame.Surface((40, 90))]
+        update_images(self.things)
+        visible = cull(self.things, self.offset, self.view)
+        self.assertEquals(
+            [x.name for x in visible], ["box 0", "box 3", "box 4"])
+        self.things[4].location[0] = 130
+        self.assertEquals(len(cull(self.things, self.offset, self.view)), 2)
+
+
+class StaticLayerTestCase(TestCase):
+
+    def setUp(self):
+        self.offset = [150, 50]
+        self.background = pygame.Surface((300, 200))
+        self.background.fill((0, 80, 0))
+        self.wall = self.makeThing(
+            PhysicalThing, "wall", [0, 60, 0], [10, 60, 40], (90, 90, 90))
+        self.sofa = self.makeThing(
+            PhysicalThing, "sofa", [40, 40, 0], [30, 15, 15], (200, 0, 0))
+        self.walker = self.makeThing(
+            MovableThing, "walker", [10, 30, 0], [10, 10, 30], (0, 0, 255),
+            fixed=False)
+        self.things = [self.wall, self.sofa, self.walker]
+        self.layer = StaticLayer()
+        self.tracker = ChangeTracker()
+        self.sorter = DepthSorter()
+        self.surface = self.background.copy()
+
+    def makeThing(self, thingClass, name, location, size, colour, **kwds):
+        width = size[0] + size[1]
+        image = pygame.Surface(
+            (width, width / 2 + size[2]), pygame.SRCALPHA)
+        image.fill(colour + (160,))
+        return thingClass(
+            name=name, location=location, size=size, skin=Skin([image]),
+            **kwds)
+
+    def draw(self):
+        rects = viewDraw(
+            self.surface, self.things, self.offset, depthSorter=self.sorter,
+            changeTracker=self.tracker, background=self.background,
+            staticLayer=self.layer)
+        # Drawn again from scratch with the images shown this frame, as
+        # animated skins move on to their next image with every call.
+        expected = self.background.copy()
+        ordered_draw([x.renderRecord for x in self.things],
+                     order(self.things), expected)
+        self.assertEquals(
+            pygame.image.tostring(self.surface, "RGB"),
+            pygame.image.tostring(expected, "RGB"))
+        return rects
+
+    def test_walkPast(self):
+        # The walker goes behind the sofa and then comes out in front of it.
+        for step in range(40):
+            self.walker.location[0] += 2
+            self.draw()
+        self.assertEquals(self.layer.builds, 1)
+
+    def test_rebuild(self):
+        self.draw()
+        self.draw()
+        self.assertEquals(self.layer.builds, 1)
+        self.sofa.location[1] += 5
+        self.draw()
+        self.assertEquals(self.layer.builds, 2)
+        self.things.remove(self.wall)
+        self.draw()
+        self.assertEquals(self.layer.builds, 3)
+
+    def test_depthSorter(self):
+        for step in range(10):
+            self.walker.location[0] += 2
+            self.draw()
+        self.assertEquals(self.sorter.things, [self.walker])
+
+    def test_changedImage(self):
+        # A fixed object that changes its image is drawn with the moving
+        # objects from then on, rather than in the layer.
+        self.draw()
+        image = self.sofa.skin.images[0].copy()
+        image.fill((250, 250, 0, 160))
+        self.sofa.skin.images = [image]
+        self.draw()
+        self.assertEquals(self.layer.builds, 2)
+        self.assertFalse(self.layer.isStatic(self.sofa))
+        self.sofa.skin.images = [self.wall.skin.images[0]]
+        rects = self.draw()
+        self.assertEquals(self.layer.builds, 2)
+        self.assertNotEquals(rects, [self.surface.get_rect()])
+
+    def test_animatedSkin(self):
+        frames = [self.sofa.skin.images[0].copy() for x in range(2)]
+        frames[1].fill((250, 250, 0, 160))
+        self.sofa.skin = AnimatedSkin(frames)
+        for step in range(10):
+            self.draw()
+        self.assertEquals(self.layer.builds, 1)
+
+    def test_movingFixedObject(self):
+        # A fixed object falling into place, like the guitar in the TwoRooms
+        # example, is drawn with the moving objects once it has moved, and
+        # only the parts of the view it covered are drawn again, leaving
+        # anything else drawn on the display (a title panel, say) alone.
+        self.draw()
+        panel = pygame.Rect(0, 0, 300, 10)
+        self.surface.fill((255, 255, 255), panel)
+        for step in range(10):
+            self.sofa.location[2] += 1
+            viewDraw(
+                self.surface, self.things, self.offset,
+                depthSorter=self.sorter, changeTracker=self.tracker,
+                background=self.background, staticLayer=self.layer)
+        self.assertEquals(self.layer.builds, 2)
+        self.assertFalse(self.layer.isStatic(self.sofa))
+        self.assertEquals(
+            pygame.image.tostring(self.surface.subsurface(panel), "RGB"),
+            "\xff" * 3 * panel.width * panel.height)
+        # The rest of the view is as a full redraw would leave it.
+        self.surface.fill((0, 80, 0), panel)
+        self.draw()
@@ -0,0 +1,406 @@
+from random import Random
+from unittest import TestCase
+
+from isomyr import physics
+from isomyr.broadphase import AllPairs
+from isomyr.engine import Responder
+from isomyr.testing.scenes import (
+    TickingWorld, buildCrowd, buildRoom, simulate)
+from isomyr.thing import (
+    ALL_CATEGORIES, CATEGORY_DEFAULT, FallableThing, MovableThing,
+    PhysicalThing, Trigger)
+from isomyr.world.world import Scene
+from isomyr.util.vector import (
+    addVectors, divideVectors, multiplyVectors, replaceVector,
+    reverseDirection)
+
+
+def randomThings(count=60, seed=1, low=0, high=50):
+    random = Random(seed)
+    return [PhysicalThing(
+        "thing %s" % x,
+        [random.randint(low, high) for axis in range(3)],
+        [random.randint(1, 15) for axis in range(3)])
+        for x in range(count)]
+
+
+def referenceTouch(object1, object2):
+    """
+    The original touch test, built from a projected PhysicalThing.
+    """
+    sense_object1 = PhysicalThing(
+        name="touch sense", location=[0, 0, 0], size=[0, 0, 0])
+    centre_object1 = addVectors(
+        object1.location, divideVectors(object1.size, [2, 2, 2]))
+    centre_object2 = addVectors(
+        object2.location, divideVectors(object2.size, [2, 2, 2]))
+    project_vector = multiplyVectors(reverseDirection(
+        centre_object1, centre_object2), [2, 2, 2])
+    sense_object1.location = addVectors(object1.location, project_vector)
+    replaceVector(object1.size, sense_object1.size)
+    return physics.detectCollision(sense_object1, object2)
+
+
+def referenceCollisionProcessor(obj_group):
+    """
+    The original collision processor, which retests every pair on every pass
+    until one finds no impact.
+    """
+    while True:
+        noimpact = True
+        for index1, object1 in enumerate(obj_group):
+            for object2 in obj_group[index1 + 1:]:
+                if physics.needsCollisionTest(object1, object2):
+                    imp = physics.detectCollision(object1, object2)
+                    if imp.impact is True:
+                        physics.collisionResponse(object1, object2, imp)
+                        object1.eventCollision(
+                            object2, imp.impactSide_object1)
+                        object2.eventCollision(
+                            object1, imp.impactSide_object2)
+                        noimpact = False
+        if noimpact is True:
+            break
+
+
+class ReferenceResponder(Responder):
+
+    def update(self, scene):
+        for thing in list(scene.objectList):
+            thing.respond()
+        referenceCollisionProcessor(scene.objectList)
+        physics.touchProcessor(scene.objectList, AllPairs())
+
+
+def buildStack(height=6):
+    """
+    A column of boxes dropped into each other, which takes several passes to
+    push apart.
+    """
+    scene = Scene(name="stack", world=TickingWorld())
+    scene.addObject(PhysicalThing("floor", [-50, -50, -10], [100, 100, 10]))
+    for index in range(height):
+        scene.addObject(MovableThing(
+            name="box %s" % index, location=[0, 0, index * 6],
+            size=[10, 10, 10], fixed=False))
+    return scene
+
+
+def describe(imp):
+    return (imp.impact, imp.impact_time, imp.impactSide_object1,
+            imp.impactSide_object2)
+
+
+class TouchTestCase(TestCase):
+
+    def assertMatchesReference(self, things):
+        for thing1 in things:
+            for thing2 in things:
+                self.assertEquals(
+                    describe(physics.touch(thing1, thing2)),
+                    describe(referenceTouch(thing1, thing2)))
+
+    def test_matchesReference(self):
+        self.assertMatchesReference(randomThings(40))
+
+    def test_matchesReferenceNegative(self):
+        self.assertMatchesReference(randomThings(40, seed=2, low=-30, high=5))
+
+    def test_adjacent(self):
+        floor = PhysicalThing("floor", [0, 0, -10], [100, 100, 10])
+        box = PhysicalThing("box", [10, 10, 0], [10, 10, 10])
+        imp = physics.touch(box, floor)
+        self.assertEquals(describe(imp), (True, 2, 5, 4))
+
+    def test_noContact(self):
+        floor = PhysicalThing("floor", [0, 0, -10], [100, 100, 10])
+        box = PhysicalThing("box", [10, 10, 2], [10, 10, 10])
+        self.assertTrue(physics.touch(box, floor) is physics.NO_CONTACT)
+        self.assertEquals(physics.NO_CONTACT.impact, False)
+
+
+class CollisionBatchTestCase(TestCase):
+
+    def setUp(self):
+        self.things = randomThings()
+        self.batch = physics.CollisionBatch(self.things, rowsPerBlock=16)
+
+    def assertMatchesScalar(self, hits, test):
+        expected = {}
+        for index1, thing1 in enumerate(self.things):
+            for index2 in range(index1 + 1, len(self.things)):
+                imp = test(thing1, self.things[index2])
+                if imp.impact:
+                    expected.setdefault(index1, []).append(
+                        (index2, describe(imp)))
+        result = dict([
+            (index1, [(index2, describe(imp)) for index2, imp in row])
+            for index1, row in hits.items()])
+        self.assertEquals(result, expected)
+
+    def test_detectAllCollisions(self):
+        self.assertMatchesScalar(
+            self.batch.detectAll(), physics.detectCollision)
+
+    def test_detectAllTouches(self):
+        self.assertMatchesScalar(
+            self.batch.detectAll(touching=True), physics.touch)
+
+    def test_detectRow(self):
+        row = self.batch.detectRow(3, [10, 20, 30, 40])
+        expected = []
+        for index in [10, 20, 30, 40]:
+            imp = physics.detectCollision(self.things[3], self.things[index])
+            if imp.impact:
+                expected.append((index, describe(imp)))
+        self.assertEquals([(x, describe(imp)) for x, imp in row], expected)
+
+    def test_move(self):
+        self.things[0].location = [200, 200, 200]
+        self.batch.move(0)
+        self.assertEquals(self.batch.detectRow(0), [])
+
+    def test_empty(self):
+        self.assertEquals(physics.CollisionBatch([]).detectAll(), {})
+
+
+class BatchProcessorTestCase(TestCase):
+
+    def assertSameSimulation(self, buildScene, ticks=40):
+        expected = simulate(buildScene(), ticks, Responder(AllPairs()))
+        result = simulate(buildScene(), ticks, Responder(batch=True))
+        self.assertEquals(result, expected)
+
+    def test_room(self):
+        self.assertSameSimulation(buildRoom)
+
+    def test_crowd(self):
+        self.assertSameSimulation(lambda: buildCrowd(count=30))
+
+
+class IncrementalCollisionTestCase(TestCase):
+    """
+    Follow-up passes only retest pairs involving moved objects, which must not
+    change the outcome.
+    """
+    def assertMatchesReference(self, buildScene, responder, ticks=40):
+        expected = simulate(buildScene(), ticks, ReferenceResponder())
+        result = simulate(buildScene(), ticks, responder)
+        self.assertEquals(result, expected)
+
+    def test_roomAllPairs(self):
+        self.assertMatchesReference(
+            buildRoom, Responder(AllPairs(), maxCollisionPasses=None))
+
+    def test_crowdAllPairs(self):
+        self.assertMatchesReference(
+            lambda: buildCrowd(count=30),
+            Responder(AllPairs(), maxCollisionPasses=None))
+
+    def test_crowdSpatialHash(self):
+        self.assertMatchesReference(
+            lambda: buildCrowd(count=30),
+            Responder(maxCollisionPasses=None))
+
+    def test_stackBatch(self):
+        self.assertMatchesReference(
+            buildStack, Responder(batch=True, maxCollisionPasses=None), 5)
+
+    def test_stackStats(self):
+        scene = buildStack()
+        stats = physics.collisionProcessor(scene.objectList, maxPasses=None)
+        self.assertTrue(stats.converged)
+        self.assertTrue(stats.passes > 2)
+        self.assertTrue(stats.impacts >= stats.passes - 1)
+        # Later passes only test the pairs with a moved object.
+        self.assertTrue(stats.pairsTested < stats.passes * 21)
+        stats = physics.collisionProcessor(scene.objectList)
+        self.assertEquals(
+            (stats.passes, stats.pairsTested, stats.impacts), (1, 21, 0))
+
+    def test_batchStats(self):
+        stats = physics.batchCollisionProcessor(
+            buildStack().objectList, maxPasses=None)
+        expected = physics.collisionProcessor(
+            buildStack().objectList, maxPasses=None)
+        self.assertEquals(
+            (stats.passes, stats.impacts), (expected.passes, expected.impacts))
+
+    def test_maxPasses(self):
+        scene = buildStack()
+        stats = physics.collisionProcessor(scene.objectList, maxPasses=2)
+        self.assertEquals(stats.passes, 2)
+        self.assertEquals(stats.converged, False)
+        stats = physics.batchCollisionProcessor(
+            buildStack().objectList, maxPasses=2)
+        self.assertEquals(stats.passes, 2)
+        self.assertEquals(stats.converged, False)
+
+    def test_responderStats(self):
+        responder = Responder()
+        simulate(buildStack(), 1, responder)
+        self.assertTrue(responder.collisionStats.impacts > 0)
+
+
+class CategoryTestCase(TestCase):
+    """
+    Pairs left out by the collision and touch masks are never tested.
+    """
+    def setUp(self):
+        self.floor = PhysicalThing(
+            name="floor", location=[0, 0, -10], size=[100, 100, 10])
+        self.ghost = MovableThing(
+            name="ghost", location=[10, 10, -5], size=[10, 10, 10],
+            fixed=False, collisionMask=ALL_CATEGORIES & ~CATEGORY_DEFAULT)
+        self.things = [self.floor, self.ghost]
+        self.touches = []
+        self.ghost.eventTouch = lambda *args: self.touches.append(args)
+
+    def test_collision(self):
+        stats = physics.collisionProcessor(self.things)
+        self.assertEquals(stats.pairsTested, 0)
+        self.assertEquals(self.ghost.location, [10, 10, -5])
+
+    def test_batchCollision(self):
+        physics.batchCollisionProcessor(self.things)
+        self.assertEquals(self.ghost.location, [10, 10, -5])
+
+    def test_touch(self):
+        self.ghost.location = [10, 10, 0]
+        physics.touchProcessor(self.things)
+        self.assertEquals(len(self.touches), 1)
+        self.ghost.touchMask = 0
+        physics.touchProcessor(self.things)
+        physics.batchTouchProcessor(self.things)
+        self.assertEquals(len(self.touches), 1)
+
+
+class RecordingTrigger(Trigger):
+
+    def __init__(self, *args, **kwds):
+        super(RecordingTrigger, self).__init__(*args, **kwds)
+        self.events = []
+
+    def eventEnter(self, otherObject):
+        self.events.append(("enter", otherObject.name))
+
+    def eventStay(self, otherObject):
+        self.events.append(("stay", otherObject.name))
+
+    def eventExit(self, otherObject):
+        self.events.append(("exit", otherObject.name))
+
+
+class TriggerTestCase(TestCase):
+
+    def setUp(self):
+        self.trigger = RecordingTrigger(
+            name="trigger", location=[20, 0, 0], size=[10, 10, 10])
+        self.walker = MovableThing(
+            name="walker", location=[0, 0, 0], size=[5, 5, 5], fixed=False)
+        self.walker.velocity = [5, 0, 0]
+        self.crate = PhysicalThing(
+            name="crate", location=[22, 6, 0], size=[2, 2, 2])
+        self.scene = Scene(name="hall", world=TickingWorld())
+        self.scene.addObjects([self.trigger, self.walker, self.crate])
+
+    def test_enterStayExit(self):
+        simulate(self.scene, 8)
+        self.assertEquals(self.trigger.events, [
+            ("enter", "walker"), ("stay", "walker"), ("stay", "walker"),
+            ("stay", "walker"), ("exit", "walker")])
+
+    def test_notSolid(self):
+        simulate(self.scene, 8)
+        self.assertEquals(self.walker.location, [40, 0, 0])
+        self.assertEquals(self.crate.location, [22, 6, 0])
+
+    def test_subscribedTypes(self):
+        self.trigger.subscribedTypes = (PhysicalThing,)
+        simulate(self.scene, 1)
+        self.assertEquals(self.trigger.events, [("enter", "crate")])
+
+    def test_exitScene(self):
+        simulate(self.scene, 4)
+        self.scene.removeObject(self.walker)
+        physics.triggerProcessor(self.scene.objectList)
+        self.assertEquals(self.trigger.events[-1], ("exit", "walker"))
+        self.assertEquals(self.trigger.occupants, [])
+
+
+class SweepTestCase(TestCase):
+
+    def setUp(self):
+        self.wall = PhysicalThing("wall", [20, -50, -50], [4, 100, 100])
+        self.bullet = MovableThing(
+            name="bullet", location=[0, 0, 0], size=[5, 5, 5], fixed=False,
+            continuous=True)
+
+    def test_sweepHit(self):
+        self.bullet.last_location = [0, 0, 0]
+        self.bullet.location = [40, 0, 0]
+        self.assertEquals(physics.sweep(self.bullet, self.wall), (0.375, 0))
+
+    def test_sweepBackwards(self):
+        self.bullet.last_location = [40, 0, 0]
+        self.bullet.location = [0, 0, 0]
+        self.assertEquals(physics.sweep(self.bullet, self.wall), (0.4, 0))
+
+    def test_sweepMiss(self):
+        self.bullet.last_location = [0, 60, 0]
+        self.bullet.location = [40, 60, 0]
+        self.assertEquals(physics.sweep(self.bullet, self.wall), None)
+
+    def test_sweepShort(self):
+        self.bullet.last_location = [0, 0, 0]
+        self.bullet.location = [10, 0, 0]
+        self.assertEquals(physics.sweep(self.bullet, self.wall), None)
+
+    def test_sweepDiagonal(self):
+        self.bullet.last_location = [0, -60, 0]
+        self.bullet.location = [40, 20, 0]
+        self.assertEquals(physics.sweep(self.bullet, self.wall), (0.375, 0))
+
+    def test_needsSweep(self):
+        self.bullet.last_location = [0, 0, 0]
+        self.bullet.location = [5, 0, 0]
+        self.assertEquals(physics.needsSweep(self.bullet), False)
+        self.bullet.location = [6, 0, 0]
+        self.assertEquals(physics.needsSweep(self.bullet), True)
+        self.bullet.continuous = False
+        self.assertEquals(physics.needsSweep(self.bullet), False)
+
+
+class SweptCollisionTestCase(TestCase):
+
+    def buildRange(self, continuous):
+        scene = Scene(name="range", world=TickingWorld())
+        wall = PhysicalThing("wall", [20, -50, -50], [4, 100, 100])
+        bullet = MovableThing(
+            name="bullet", location=[0, 0, 0], size=[5, 5, 5], fixed=False,
+            continuous=continuous)
+        bullet.velocity = [30, 0, 0]
+        scene.addObjects([wall, bullet])
+        return scene, bullet
+
+    def test_tunnelling(self):
+        scene, bullet = self.buildRange(continuous=False)
+        simulate(scene, 1)
+        self.assertEquals(bullet.location, [30, 0, 0])
+
+    def test_stopsAtWall(self):
+        scene, bullet = self.buildRange(continuous=True)
+        simulate(scene, 1)
+        self.assertEquals(bullet.location, [14, 0, 0])
+
+    def test_fastFall(self):
+        scene = Scene(name="drop", world=TickingWorld())
+        floor = PhysicalThing("floor", [-50, -50, -4], [100, 100, 4])
+        crate = FallableThing(
+            name="crate", location=[0, 0, 100], size=[10, 10, 10],
+            fixed=False, continuous=True)
+        crate.velocity = [0, 0, -60]
+        scene.addObjects([floor, crate])
+        simulate(scene, 3)
+        self.assertEquals(crate.location[2], 0)
+        self.assertEquals(crate.falling, False)
@@ -0,0 +1,250 @@
+from random import Random
+from unittest import TestCase
+
+import pygame
+
+from isomyr import sprites
+from isomyr.isometric import group_transform, viewDraw
+from isomyr.skin import AnimatedSkin, Skin
+from isomyr.thing import PhysicalThing
+
+
+class RenderRecordTestCase(TestCase):
+
+    def setUp(self):
+        self.small = pygame.Surface((10, 20))
+        self.large = pygame.Surface((30, 40))
+        self.box = PhysicalThing(
+            name="box", location=[10, 10, 0], size=[10, 10, 10],
+            skin=AnimatedSkin([self.small, self.large]))
+        self.crate = PhysicalThing(
+            name="crate", location=[30, 10, 0], size=[5, 5, 5],
+            skin=Skin([self.small]))
+
+    def test_reused(self):
+        first = sprites.update_images([self.box, self.crate])
+        second = sprites.update_images([self.box, self.crate])
+        self.assertTrue(first[0] is second[0])
+        self.assertTrue(first[0].rect is second[0].rect)
+        self.assertTrue(first[0] is self.box.renderRecord)
+
+    def test_imageSize(self):
+        record = sprites.getRenderRecord(self.box)
+        record.setImage(self.large)
+        self.assertEquals(record.rect.size, (30, 40))
+        record.rect.topleft = (5, 6)
+        record.setImage(self.small)
+        self.assertEquals(record.rect, pygame.Rect(5, 6, 10, 20))
+
+    def test_transformAndDraw(self):
+        records = sprites.update_images([self.box, self.crate])
+        group_transform([self.box, self.crate], records, [100, 50])
+        self.assertEquals(records[0].rect.topleft, (90, 50))
+        self.assertEquals(records[1].rect.topleft, (115, 65))
+        surface = pygame.Surface((200, 200))
+        drawn = sprites.ordered_draw(records, [1, 0], surface)
+        self.assertEquals(drawn, [records[1].rect, records[0].rect])
+
+
+class BlitSequenceTestCase(TestCase):
+
+    def setUp(self):
+        self.red = pygame.Surface((10, 10))
+        self.red.fill((255, 0, 0))
+        self.blue = pygame.Surface((10, 10))
+        self.blue.fill((0, 0, 255))
+        self.sequence = [
+            (self.red, pygame.Rect(0, 0, 10, 10)),
+            (self.blue, pygame.Rect(5, 5, 10, 10)),
+            (self.red, pygame.Rect(15, 0, 10, 10)),
+            (self.blue, pygame.Rect(-5, 15, 10, 10)),
+            ]
+
+    def test_batchedMatchesSingle(self):
+        single = pygame.Surface((20, 20))
+        batched = pygame.Surface((20, 20))
+        singleRects = sprites.blit_sequence(single, self.sequence, False)
+        batchedRects = sprites.blit_sequence(batched, self.sequence, True)
+        self.assertEquals(batchedRects, singleRects)
+        self.assertEquals(
+            pygame.image.tostring(batched, "RGB"),
+            pygame.image.tostring(single, "RGB"))
+        # The later blits are drawn over the earlier ones, and are clipped to
+        # the surface.
+        self.assertEquals(single.get_at((7, 7)), (0, 0, 255, 255))
+        self.assertEquals(singleRects[2], pygame.Rect(15, 0, 5, 10))
+
+    def test_restoreArea(self):
+        background = pygame.Surface((20, 20))
+        background.fill((0, 255, 0))
+        background.fill((255, 255, 255), pygame.Rect(10, 10, 10, 10))
+        surface = pygame.Surface((20, 20))
+        sprites.blit_sequence(surface, [
+            (background, rect, rect) for rect in [
+                pygame.Rect(0, 0, 5, 5), pygame.Rect(12, 12, 20, 20)]])
+        self.assertEquals(surface.get_at((2, 2)), (0, 255, 0, 255))
+        self.assertEquals(surface.get_at((15, 15)), (255, 255, 255, 255))
+        self.assertEquals(surface.get_at((7, 7)), (0, 0, 0, 255))
+
+
+class CoalesceTestCase(TestCase):
+
+    def area(self, rects):
+        return sum([x.width * x.height for x in rects])
+
+    def covers(self, rects, rect):
+        for x in range(rect.left, rect.right):
+            for y in range(rect.top, rect.bottom):
+                if not [r for r in rects if r.collidepoint(x, y)]:
+                    return False
+        return True
+
+    def test_contained(self):
+        rects = sprites.coalesce_rectangles([
+            pygame.Rect(0, 0, 20, 20), pygame.Rect(5, 5, 5, 5)])
+        self.assertEquals(rects, [pygame.Rect(0, 0, 20, 20)])
+
+    def test_adjacent(self):
+        rects = sprites.coalesce_rectangles([
+            pygame.Rect(0, 0, 10, 10), pygame.Rect(10, 0, 10, 10),
+            pygame.Rect(0, 10, 20, 5)])
+        self.assertEquals(rects, [pygame.Rect(0, 0, 20, 15)])
+
+    def test_apart(self):
+        rects = [pygame.Rect(0, 0, 10, 10), pygame.Rect(100, 100, 10, 10),
+                 pygame.Rect(0, 0, 0, 0)]
+        self.assertEquals(
+            sorted(sprites.coalesce_rectangles(rects)), sorted(rects[:2]))
+
+    def test_cornerOverlap(self):
+        # Joining these would cover more than the two of them, so they are
+        # kept as they are.
+        rects = [pygame.Rect(0, 0, 20, 20), pygame.Rect(10, 10, 20, 20)]
+        self.assertEquals(
+            sorted(sprites.coalesce_rectangles(rects)), rects)
+
+    def test_movedSprites(self):
+        # Joining the rectangles by list index would stretch them across the
+        # gap between the two sprites, which have swapped places.
+        old = [pygame.Rect(0, 0, 10, 10), pygame.Rect(200, 0, 10, 10)]
+        new = [pygame.Rect(202, 2, 10, 10), pygame.Rect(2, 2, 10, 10)]
+        rects = sprites.combine_rectangles(new, old)
+        self.assertEquals(len(rects), 2)
+        self.assertEquals(self.area(rects), 2 * 12 * 12)
+        for rect in old + new:
+            self.assertTrue(self.covers(rects, rect))
+
+    def test_scattered(self):
+        random = Random(3)
+        rects = [pygame.Rect(random.randint(0, 300), random.randint(0, 200),
+                             random.randint(1, 40), random.randint(1, 60))
+                 for x in range(200)]
+        coalesced = sprites.coalesce_rectangles(rects, cellSize=16)
+        for rect in rects:
+            self.assertTrue(self.covers(coalesced, rect))
+        # No two of the rectangles left could be joined.
+        for index, rect in enumerate(coalesced):
+            for other in coalesced[index + 1:]:
+                union = rect.union(other)
+                self.assertTrue(
+                    union.width * union.height >
+                    self.area([rect, other]))
+
+
+class DirtyRegionTestCase(TestCase):
+
+    def setUp(self):
+        self.screen = pygame.Rect(0, 0, 100, 100)
+        self.region = sprites.DirtyRegion(fullUpdateRatio=0.5)
+
+    def test_clipped(self):
+        self.region.add([pygame.Rect(-10, -10, 20, 20)])
+        self.region.add([pygame.Rect(95, 0, 10, 10)])
+        self.assertEquals(
+            sorted(self.region.getRectangles(self.screen)),
+            [pygame.Rect(0, 0, 10, 10), pygame.Rect(95, 0, 5, 10)])
+
+    def test_coalesced(self):
+        # Rectangles already coalesced are only clipped, unless others were
+        # added with them.
+        rects = [pygame.Rect(0, 0, 20, 20), pygame.Rect(5, 5, 5, 5)]
+        self.region.add(rects, coalesced=True)
+        self.assertEquals(self.region.getRectangles(self.screen), rects)
+        self.region.add([pygame.Rect(90, 90, 5, 5)])
+        self.assertEquals(
+            sorted(self.region.getRectangles(self.screen)),
+            [pygame.Rect(0, 0, 20, 20), pygame.Rect(90, 90, 5, 5)])
+
+    def test_full(self):
+        small = [pygame.Rect(0, 0, 50, 50)]
+        large = [pygame.Rect(0, 0, 50, 50), pygame.Rect(50, 50, 50, 50),
+                 pygame.Rect(0, 50, 1, 1)]
+        self.assertFalse(self.region.isFull(small, self.screen))
+        self.assertTrue(self.region.isFull(large, self.screen))
+
+
+class ChangeTrackerTestCase(TestCase):
+
+    def setUp(self):
+        self.background = pygame.Surface((200, 200))
+        self.background.fill((0, 80, 0))
+        self.red = pygame.Surface((20, 30), pygame.SRCALPHA)
+        self.red.fill((255, 0, 0, 128))
+        self.blue = pygame.Surface((20, 30), pygame.SRCALPHA)
+        self.blue.fill((0, 0, 255, 128))
+        self.box = PhysicalThing(
+            name="box", location=[10, 10, 0], size=[10, 10, 10],
+            skin=Skin([self.red]))
+        self.crate = PhysicalThing(
+            name="crate", location=[14, 14, 0], size=[10, 10, 10],
+            skin=Skin([self.blue]))
+        self.things = [self.box, self.crate]
+        self.tracker = sprites.ChangeTracker()
+
+    def track(self, things):
+        records = sprites.update_images(things)
+        group_transform(things, records, [100, 50])
+        return self.tracker.update(things, records)
+
+    def render(self, things, surface=None, tracker=None):
+        """
+        Draw the things, from scratch or with a change tracker.
+        """
+        if surface is None:
+            surface = self.background.copy()
+        viewDraw(
+            surface, things, [100, 50], changeTracker=tracker,
+            background=self.background)
+        return surface
+
+    def test_static(self):
+        first = self.track(self.things)
+        self.assertEquals(len(first), 1)
+        self.assertEquals(self.track(self.things), [])
+
+    def test_changes(self):
+        self.track(self.things)
+        old = pygame.Rect(self.crate.renderRecord.rect)
+        self.crate.location[0] += 1
+        self.assertEquals(
+            self.track(self.things), [old.union(self.crate.renderRecord.rect)])
+        self.box.skin.images = [self.blue]
+        self.assertEquals(
+            self.track(self.things), [pygame.Rect(self.box.renderRecord.rect)])
+        crate = pygame.Rect(self.crate.renderRecord.rect)
+        self.assertEquals(self.track([self.box]), [crate])
+        self.assertEquals(self.track(self.things), [crate])
+
+    def test_redrawMatches(self):
+        tracker = sprites.ChangeTracker()
+        surface = self.render(self.things, tracker=tracker)
+        self.assertEquals(
+            pygame.image.tostring(surface, "RGB"),
+            pygame.image.tostring(self.render(self.things), "RGB"))
+        for change in range(4):
+            self.crate.location[change % 2] += 3
+            self.box.skin.images = [[self.red, self.blue][change % 2]]
+            self.render(self.things, surface, tracker)
+            self.assertEquals(
+                pygame.image.tostring(surface, "RGB"),
+                pygame.image.tostring(self.render(self.things), "RGB"))
@@ -10,6 +10,17 @@ WEST_SIDE = 0
 BOTTOM_SIDE = 5
 
 
+# Collision categories. Each physical thing belongs to one or more categories
+# and has a mask of the categories it collides with and another of those it
+# touches; a pair of things is only tested if each is in the other's mask.
+# Games are free to define categories of their own with the higher bits.
+CATEGORY_DEFAULT = 1 << 0
+CATEGORY_SCENERY = 1 << 1
+CATEGORY_PORTAL = 1 << 2
+CATEGORY_TRIGGER = 1 << 3
+ALL_CATEGORIES = ~0
+
+
 class ThingText(object):
 
     def __init__(self):
@@ -137,6 +148,9 @@ class Thing(ProtoThing):
         self.velocity = [0, 0, 0]
         self.size = size
         self.fixed = fixed
+        # The image and screen rectangle the thing was last drawn with (see
+        # isomyr.sprites).
+        self.renderRecord = None
         if skin:
             self.setSkin(skin)
         else:
@@ -164,10 +178,21 @@ class PhysicalThing(Thing):
     vel: velocity vector : list of 3 integers [vx, vy, vz]
     old_pos: The previous location vector of the object (unused ??): list of 3
         integers [x, y, z]
+    category: the collision categories the object belongs to: integer bits
+    collisionMask: the categories the object can collide with: integer bits
+    touchMask: the categories the object can touch: integer bits
     """
     def __init__(self, weight=None, *args, **kwds):
+        # Taken as keywords only, so that existing positional arguments keep
+        # their meaning.
+        category = kwds.pop("category", CATEGORY_DEFAULT)
+        collisionMask = kwds.pop("collisionMask", ALL_CATEGORIES)
+        touchMask = kwds.pop("touchMask", ALL_CATEGORIES)
         super(PhysicalThing, self).__init__(*args, **kwds)
         self.weight = weight
+        self.category = category
+        self.collisionMask = collisionMask
+        self.touchMask = touchMask
 
     def eventCollision(self, otherObject, impactSide):
         """
@@ -200,11 +225,65 @@ class PhysicalThing(Thing):
         pass
 
 
+class Trigger(PhysicalThing):
+    """
+    A volume that notices things entering, staying in and leaving it, without
+    ever colliding with or touching anything. Triggers are left out of the
+    collision and touch processors by their masks and are run by a cheap pass
+    of their own (see physics.triggerProcessor), which only tests them against
+    the types of object they are subscribed to.
+
+    An object counts as inside the trigger as soon as their boxes touch.
+
+    subscribedTypes: the classes of object the trigger notices: tuple of
+        classes
+    occupants: the subscribed objects inside the trigger as of the last
+        tick: list of object_3d class or subclass
+    """
+    def __init__(self, *args, **kwds):
+        # Taken as a keyword only, like the collision categories.
+        subscribedTypes = kwds.pop("subscribedTypes", (MovableThing,))
+        kwds.setdefault("category", CATEGORY_TRIGGER)
+        kwds.setdefault("collisionMask", 0)
+        kwds.setdefault("touchMask", 0)
+        super(Trigger, self).__init__(*args, **kwds)
+        self.subscribedTypes = subscribedTypes
+        self.occupants = []
+
+    def eventEnter(self, otherObject):
+        """
+        Event handler for an object coming into the trigger.
+        """
+        return
+
+    def eventStay(self, otherObject):
+        """
+        Event handler for an object still inside the trigger, called on every
+        tick after the one it entered on.
+        """
+        return
+
+    def eventExit(self, otherObject):
+        """
+        Event handler for an object leaving the trigger (or the scene).
+        """
+        return
+
+
 class MovableThing(PhysicalThing):
+    """
+    A physical thing that moves by its velocity every tick.
 
+    continuous: turns on swept (continuous) collision detection, so that the
+        object stops at whatever it runs into even when it moves further than
+        its own size in a single tick: boolean
+    """
     def __init__(self, velocityModifier=1, *args, **kwds):
+        # Taken as a keyword only, like the collision categories.
+        continuous = kwds.pop("continuous", False)
         super(MovableThing, self).__init__(*args, **kwds)
         self.velocityModifier = velocityModifier
+        self.continuous = continuous
         self.last_scene = None
 
     def respond(self):
@@ -0,0 +1,286 @@
+"""
+Texture atlases: the images of many skins packed together into a few large
+surfaces, which the skins then draw from as subsurfaces.
+"""
+import json
+import os
+
+import pygame
+
+
+# The size of the surfaces that images are packed into.
+DEFAULT_PAGE_SIZE = (1024, 1024)
+
+# The attributes of the skins (see isomyr.skin) that hold lists of images.
+IMAGE_LISTS = ("images", "south", "east", "north", "west")
+
+
+class SkylinePacker(object):
+    """
+    Packs rectangles into an area by keeping track of its skyline, the top
+    edge of the rectangles placed so far, and putting each new rectangle
+    wherever on the skyline leaves its top lowest.
+
+    width, height: the size of the area: integers
+    """
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        # The skyline, left to right, as [x, y, width] segments.
+        self.skyline = [[0, 0, width]]
+
+    def fit(self, index, width, height):
+        """
+        Returns the lowest place a rectangle can go with its left edge at the
+        start of a skyline segment, or None if it won't fit there.
+        """
+        x = self.skyline[index][0]
+        if x + width > self.width:
+            return None
+        y = 0
+        remaining = width
+        while remaining > 0:
+            segmentX, segmentY, segmentWidth = self.skyline[index]
+            y = max(y, segmentY)
+            if y + height > self.height:
+                return None
+            remaining -= segmentWidth
+            index += 1
+        return y
+
+    def insert(self, width, height):
+        """
+        Place a rectangle.
+
+        Returns its (x, y) position, or None if there is no room for it.
+        """
+        best = None
+        for index, segment in enumerate(self.skyline):
+            y = self.fit(index, width, height)
+            if y is not None:
+                key = (y + height, segment[0])
+                if best is None or key < best[0]:
+                    best = (key, index, y)
+        if best is None:
+            return None
+        key, index, y = best
+        x = self.skyline[index][0]
+        self.skyline.insert(index, [x, y + height, width])
+        # Cut back the segments now under the new one.
+        index += 1
+        while index < len(self.skyline):
+            segmentX, segmentY, segmentWidth = self.skyline[index]
+            covered = x + width - segmentX
+            if covered <= 0:
+                break
+            if covered < segmentWidth:
+                self.skyline[index] = [
+                    segmentX + covered, segmentY, segmentWidth - covered]
+                break
+            del self.skyline[index]
+        # Join segments at the same height.
+        for index in range(len(self.skyline) - 1, 0, -1):
+            if self.skyline[index - 1][1] == self.skyline[index][1]:
+                self.skyline[index - 1][2] += self.skyline[index][2]
+                del self.skyline[index]
+        return (x, y)
+
+
+class Atlas(object):
+    """
+    Images packed onto a few large pages. Images can only share a page if
+    they have the same pixel format, colorkey and alpha, so each page holds
+    images of one kind.
+
+    pageSize: the size of the pages: (width, height)
+
+    pages: the packed surfaces: list of surfaces
+    regions: the subsurface of a page that each packed image was copied to,
+        by the id of the image: dict
+    packed: whether the layout was packed afresh, rather than read from a
+        layout file, on the last build: boolean
+    """
+    def __init__(self, pageSize=DEFAULT_PAGE_SIZE):
+        self.pageSize = tuple(pageSize)
+        self.pages = []
+        self.regions = {}
+        self.packed = False
+
+    def getKind(self, image):
+        return (image.get_bitsize(), image.get_flags() & pygame.SRCALPHA,
+                image.get_colorkey(), image.get_alpha())
+
+    def pack(self, images):
+        """
+        Work out where each image goes.
+
+        Returns a (page, x, y) list for the images, with None for those too
+        big for a page.
+        """
+        layout = [None] * len(images)
+        # Pages of each kind, as [page number, packer] pairs.
+        pages = {}
+        pageCount = 0
+        # The tallest first, which packs more tightly.
+        for index in sorted(range(len(images)),
+                            key=lambda x: -images[x].get_height()):
+            width, height = images[index].get_size()
+            kind = repr(self.getKind(images[index]))
+            for page, packer in pages.get(kind, []):
+                position = packer.insert(width, height)
+                if position:
+                    break
+            else:
+                packer = SkylinePacker(*self.pageSize)
+                position = packer.insert(width, height)
+                if not position:
+                    continue
+                page = pageCount
+                pageCount += 1
+                pages.setdefault(kind, []).append((page, packer))
+            layout[index] = (page, position[0], position[1])
+        return layout
+
+    def getSignature(self, images):
+        """
+        A description of the images that a stored layout must match to be
+        used for them.
+        """
+        return [list(self.pageSize)] + [
+            [x.get_width(), x.get_height(), repr(self.getKind(x))]
+            for x in images]
+
+    def readLayout(self, layoutFile, signature):
+        if not os.path.exists(layoutFile):
+            return None
+        with open(layoutFile) as layoutData:
+            stored = json.load(layoutData)
+        if stored.get("signature") != signature:
+            return None
+        return stored["layout"]
+
+    def writeLayout(self, layoutFile, signature, layout):
+        with open(layoutFile, "w") as layoutData:
+            json.dump({"signature": signature, "layout": layout}, layoutData)
+
+    def build(self, images, layoutFile=None):
+        """
+        Pack the images onto pages.
+
+        @param images: the images to pack; repeats are packed once: list of
+            surfaces
+        @param layoutFile: a JSON file to keep the layout in, so that it need
+            only be packed once for the same images: string
+        """
+        unique = []
+        seen = set()
+        for image in images:
+            if id(image) not in seen:
+                seen.add(id(image))
+                unique.append(image)
+        layout = None
+        if layoutFile:
+            signature = self.getSignature(unique)
+            layout = self.readLayout(layoutFile, signature)
+        self.packed = layout is None
+        if self.packed:
+            layout = self.pack(unique)
+            if layoutFile:
+                self.writeLayout(layoutFile, signature, layout)
+        self.pages = []
+        self.regions = {}
+        for image, place in zip(unique, layout):
+            if place is None:
+                continue
+            page, x, y = place
+            while len(self.pages) <= page:
+                self.pages.append(None)
+            if self.pages[page] is None:
+                self.pages[page] = self.makePage(image)
+            self.regions[id(image)] = self.copyImage(
+                image, self.pages[page], (x, y))
+
+    def makePage(self, image):
+        """
+        Make a blank page for images of the same kind as this one.
+        """
+        alpha = image.get_flags() & pygame.SRCALPHA
+        page = pygame.Surface(self.pageSize, alpha, image)
+        colorkey = image.get_colorkey()
+        if alpha:
+            page.fill((0, 0, 0, 0))
+        elif colorkey:
+            page.fill(colorkey)
+            page.set_colorkey(colorkey, image.get_flags() & pygame.RLEACCEL)
+        if not alpha and image.get_alpha() is not None:
+            page.set_alpha(image.get_alpha())
+        return page
+
+    def copyImage(self, image, page, position):
+        """
+        Copy the pixels of an image onto a page unchanged, returning the
+        region of the page they were copied to.
+        """
+        if image.get_flags() & pygame.SRCALPHA:
+            # The page is clear, so this copies the alpha channel too.
+            page.blit(image, position, special_flags=pygame.BLEND_RGBA_MAX)
+        else:
+            source = image.copy()
+            source.set_colorkey(None)
+            source.set_alpha(None)
+            page.blit(source, position)
+        return page.subsurface(pygame.Rect(position, image.get_size()))
+
+    def getRegion(self, image):
+        """
+        Returns the region of the atlas an image was packed into, or the image
+        itself if it wasn't packed.
+        """
+        return self.regions.get(id(image), image)
+
+
+def getSkins(container):
+    """
+    Returns the skins of the things in a scene, or in every scene of a world.
+    """
+    if hasattr(container, "scenes"):
+        scenes = [container.scenes[x] for x in sorted(container.scenes)]
+    else:
+        scenes = [container]
+    skins = []
+    seen = set()
+    for scene in scenes:
+        for thing in scene.objectList:
+            if thing.skin and id(thing.skin) not in seen:
+                seen.add(id(thing.skin))
+                skins.append(thing.skin)
+    return skins
+
+
+def getImageLists(skin):
+    return [getattr(skin, x) for x in IMAGE_LISTS
+            if isinstance(getattr(skin, x, None), list)]
+
+
+def buildAtlas(container, pageSize=DEFAULT_PAGE_SIZE, layoutFile=None):
+    """
+    Pack the images of the skins in a scene or world into an atlas, and
+    change the skins to draw from it.
+
+    @param container: a Scene or World.
+    @param pageSize: the size of the atlas pages: (width, height)
+    @param layoutFile: a JSON file to keep the layout in between runs: string
+
+    Returns the atlas: Atlas class
+    """
+    skins = getSkins(container)
+    images = []
+    for skin in skins:
+        for imageList in getImageLists(skin):
+            images.extend(imageList)
+    atlas = Atlas(pageSize)
+    atlas.build(images, layoutFile)
+    for skin in skins:
+        for imageList in getImageLists(skin):
+            imageList[:] = [atlas.getRegion(x) for x in imageList]
+    return atlas
@@ -1,17 +1,178 @@
+import json
 import os
+from collections import OrderedDict
 from glob import glob
+from multiprocessing.pool import ThreadPool
 
 import pygame
 
+from isomyr.util.pack import getName
+
+
+# The default memory budget for the asset cache, in bytes.
+DEFAULT_BUDGET = 64 * 1024 * 1024
+
+
+class AssetCache(object):
+    """
+    Keeps loaded assets, so that each file is only loaded once however many
+    objects use it, within a memory budget. When the budget is passed, the
+    least recently used assets are dropped (though the objects already using
+    them keep them).
+
+    Assets are shared between everything that loads them, so they should not
+    be changed in place.
+
+    budget: the most memory the cached assets may take up: integer bytes
+
+    hits: the number of times an asset was found in the cache: integer
+    misses: the number of times an asset had to be loaded: integer
+    bytesInUse: the memory the cached assets take up: integer bytes
+    """
+    def __init__(self, budget=DEFAULT_BUDGET):
+        self.budget = budget
+        self.clear()
+
+    def clear(self):
+        """
+        Forget all the assets and the counts.
+        """
+        # Kept in order of use, the most recently used last.
+        self.assets = OrderedDict()
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.bytesInUse = 0
+
+    def getSize(self, asset):
+        """
+        Returns the memory taken up by an asset, in bytes.
+        """
+        if isinstance(asset, pygame.Surface):
+            return asset.get_pitch() * asset.get_height()
+        return 0
+
+    def get(self, key, load):
+        """
+        Returns the asset for the key, calling load to make it if it is not
+        cached.
+        """
+        if key in self.assets:
+            self.hits += 1
+            asset = self.assets.pop(key)
+            self.assets[key] = asset
+            return asset
+        self.misses += 1
+        asset = load()
+        self.assets[key] = asset
+        self.sizes[key] = self.getSize(asset)
+        self.bytesInUse += self.sizes[key]
+        self.evict()
+        return asset
+
+    def setBudget(self, budget):
+        self.budget = budget
+        self.evict()
+
+    def evict(self):
+        """
+        Drop the least recently used assets until the cache is within its
+        budget, always keeping the most recent one.
+        """
+        while self.bytesInUse > self.budget and len(self.assets) > 1:
+            key, asset = self.assets.popitem(last=False)
+            self.bytesInUse -= self.sizes.pop(key)
+
+    def __contains__(self, key):
+        return key in self.assets
+
+    def __len__(self):
+        return len(self.assets)
+
+    def __repr__(self):
+        return "<AssetCache %s assets, %s bytes, %s hits, %s misses>" % (
+            len(self), self.bytesInUse, self.hits, self.misses)
+
+
+# The cache shared by the loaders in this process.
+assetCache = AssetCache()
+
 
 class ResourceLoader(object):
+    """
+    Loads files from a base directory.
 
-    def __init__(self, basedir="."):
+    @param basedir: the directory that file names are relative to.
+    @param workers: the number of threads that files are read on, when more
+        than one file is loaded at once; with none, every file is loaded on
+        the calling thread.
+    @param pack: an asset pack built from the base directory (see
+        isomyr.util.pack), which files are read from where it has them
+        instead of from the directory.
+    """
+    def __init__(self, basedir=".", workers=0, pack=None):
         self.basedir = os.path.abspath(basedir)
+        self.workers = workers
+        self.pack = pack
+
+    def getPackName(self, fullPath):
+        prefix = os.path.join(self.basedir, "")
+        if fullPath.startswith(prefix):
+            # Much quicker than relpath, for the usual case.
+            return getName(fullPath[len(prefix):])
+        return getName(os.path.relpath(fullPath, self.basedir))
+
+    def getSource(self, fullPath):
+        """
+        Returns where to load a file from: a file-like object for a file in
+        the pack, or else the path of the loose file.
+        """
+        if self.pack is not None:
+            name = self.getPackName(fullPath)
+            if name in self.pack:
+                return self.pack.open(name)
+        return fullPath
+
+    def openFile(self, fullPath):
+        """
+        Returns a file-like object of a file, from the pack or the directory.
+        """
+        source = self.getSource(fullPath)
+        if source is fullPath:
+            return open(fullPath, "rb")
+        return source
 
     def loadAction(self, filename):
         return filename
 
+    def readAction(self, fullPath):
+        """
+        The part of loading a file that can be done on a worker thread;
+        what it returns is passed on to finishAction.
+        """
+        return None
+
+    def finishAction(self, fullPath, data):
+        """
+        The rest of loading a file, done on the calling thread.
+        """
+        return self.loadAction(fullPath)
+
+    def loadAll(self, fullPaths):
+        """
+        Loads the files, reading them on a pool of worker threads if there
+        are workers, and returns them in the same order.
+        """
+        if not self.workers or len(fullPaths) < 2:
+            return [self.loadAction(x) for x in fullPaths]
+        pool = ThreadPool(min(self.workers, len(fullPaths)))
+        try:
+            data = pool.map(self.readAction, fullPaths)
+        finally:
+            pool.close()
+            pool.join()
+        return [self.finishAction(x, y) for x, y in zip(fullPaths, data)]
+
     def load(self, filename=None, filenames=None, fileGlob=None):
         """
         Loads a list of files.
@@ -20,35 +181,144 @@ class ResourceLoader(object):
             filenames = filename
         if filenames and not isinstance(filenames, list):
             filenames = [filenames]
+        if fileGlob and not filenames and self.pack is not None:
+            filenames = self.pack.glob(self.getPackName(
+                os.path.join(self.basedir, fileGlob)))
         if fileGlob and not filenames:
             match = os.path.join(self.basedir, fileGlob)
             filenames = sorted(glob(match))
         elif not isinstance(filenames, list):
             filenames = [filenames]
-        files = []
-        for filename in filenames:
-            fullPath = os.path.join(self.basedir, filename)
-            files.append(self.loadAction(fullPath))
-        return files
+        return self.loadAll(
+            [os.path.join(self.basedir, x) for x in filenames])
+
 
 class ImageLoader(ResourceLoader):
+    """
+    Loads images, converted for the display.
 
-    def __init__(self, transparency=None, **kwargs):
+    @param transparency: the colorkey for transparent pixels, if any.
+    @param cache: the cache that loaded images are shared through (such as
+        assetCache), or None, the default, to load every image afresh. Shared
+        images must not be changed in place, as that changes them for
+        everything else using them.
+    """
+    def __init__(self, transparency=None, cache=None, **kwargs):
         super(ImageLoader, self).__init__(**kwargs)
         self.transparency = transparency
+        self.cache = cache
+
+    def getKey(self, fullPath):
+        transparency = self.transparency
+        # Colorkeys given as lists or pygame.Colors can't be hashed.
+        if isinstance(transparency, (list, pygame.Color)):
+            transparency = tuple(transparency)
+        return (os.path.realpath(fullPath), transparency)
 
     def loadAction(self, fullPath):
-        loadedImage = pygame.image.load(fullPath).convert()
+        return self.finishAction(fullPath, self.readAction(fullPath))
+
+    def readAction(self, fullPath):
+        """
+        Decode the image, unless it is already cached. This doesn't need the
+        display, so can be done on a worker thread.
+        """
+        if self.cache is not None and self.getKey(fullPath) in self.cache:
+            return None
+        return self.loadImage(fullPath)
+
+    def finishAction(self, fullPath, image):
+        """
+        Convert the decoded image for the display, which must be done on the
+        main thread.
+        """
+        def load():
+            if image is None:
+                # It was cached when read, but has been dropped since.
+                return self.convertImage(self.loadImage(fullPath))
+            return self.convertImage(image)
+        if self.cache is None:
+            return load()
+        return self.cache.get(self.getKey(fullPath), load)
+
+    def loadImage(self, fullPath):
+        # The path is a hint to the file type when loading from the pack.
+        return pygame.image.load(self.getSource(fullPath), fullPath)
+
+    def convertImage(self, image):
+        loadedImage = image.convert()
         # Load images using a colorkey transparency, if provided.
         if self.transparency:
             loadedImage.set_colorkey(self.transparency)
         return loadedImage
 
 
+class SpriteSheetLoader(ImageLoader):
+    """
+    Loads the frames of an animation from a single image, a sprite sheet. The
+    frames are subsurfaces of the sheet, so share its pixels rather than
+    copying them, and can be given to skins like any other images.
+    """
+    def loadSheet(self, filename, frameSize=None, frameFile=None, count=None):
+        """
+        Loads the frames of a sprite sheet, described by either a grid or a
+        JSON file.
+
+        @param filename: the sprite sheet image.
+        @param frameSize: the (width, height) of the frames, for a sheet laid
+            out as a grid; the frames are taken a row at a time, from the top
+            left.
+        @param frameFile: a JSON file giving the frames, in order, as
+            {"frames": [{"x": x, "y": y, "w": width, "h": height}, ...]}; as
+            in the TexturePacker array format, the numbers may also be kept
+            in a "frame" object in each entry. The TexturePacker hash format,
+            with "frames" an object of entries by frame name, is read too,
+            taking the frames in the order the file gives them.
+        @param count: the number of frames to take, if not all of them.
+
+        Returns the frames: list of surfaces
+        """
+        sheet = self.load(filename)[0]
+        if frameFile:
+            rects = self.readFrames(os.path.join(self.basedir, frameFile))
+        elif frameSize:
+            rects = self.getGrid(sheet.get_size(), frameSize)
+        else:
+            raise ValueError("A sprite sheet needs a frameSize or frameFile.")
+        if count is not None:
+            rects = rects[:count]
+        return [sheet.subsurface(x) for x in rects]
+
+    def getGrid(self, sheetSize, frameSize):
+        width, height = frameSize
+        return [(x, y, width, height)
+                for y in range(0, sheetSize[1] - height + 1, height)
+                for x in range(0, sheetSize[0] - width + 1, width)]
+
+    def readFrames(self, fullPath):
+        descriptionFile = self.openFile(fullPath)
+        try:
+            description = json.load(
+                descriptionFile, object_pairs_hook=OrderedDict)
+        finally:
+            descriptionFile.close()
+        frames = description.get("frames")
+        if isinstance(frames, dict):
+            frames = frames.values()
+        if not isinstance(frames, list):
+            raise ValueError(
+                "%s has no list or object of frames." % fullPath)
+        rects = []
+        for frame in frames:
+            frame = frame.get("frame", frame)
+            rects.append((frame["x"], frame["y"], frame["w"], frame["h"]))
+        return rects
+
+
 class SoundLoader(ResourceLoader):
 
     def loadAction(self, fullPath):
-        return pygame.mixer.Sound(fullPath)
+        return pygame.mixer.Sound(self.getSource(fullPath))
 
     def load(self, *args, **kwds):
         return super(SoundLoader, self).load(*args, **kwds)[0]
@@ -0,0 +1,133 @@
+"""
+Asset packs: many small game files kept in one archive, read through a
+memory map, so that a game starts without a disk seek for every file.
+
+A pack starts with a header of the magic string and the offset of the index,
+followed by the files' contents one after another, and then the index: a
+JSON object giving the [offset, length] of each file by its name, the path
+it had under the packed directory with "/" separators.
+"""
+import json
+import mmap
+import os
+import struct
+from cStringIO import StringIO
+from fnmatch import fnmatch
+
+
+MAGIC = "ISOPACK1"
+
+HEADER = struct.Struct("<8sQ")
+
+# The files packed by default.
+DEFAULT_PATTERNS = (
+    "*.png", "*.gif", "*.jpg", "*.bmp", "*.wav", "*.ogg", "*.json")
+
+
+def getName(path):
+    """
+    Returns the name of a file in a pack from its path relative to the packed
+    directory.
+    """
+    name = path.replace(os.sep, "/")
+    if "./" in name or "//" in name or name.startswith("."):
+        name = os.path.normpath(path).replace(os.sep, "/")
+    return name
+
+
+def writePack(packPath, files):
+    """
+    Write a pack.
+
+    @param packPath: the pack file to write: string
+    @param files: the files to pack, as (name, path) pairs: list
+    """
+    index = {}
+    with open(packPath, "wb") as pack:
+        pack.write(HEADER.pack(MAGIC, 0))
+        for name, path in files:
+            with open(path, "rb") as packedFile:
+                data = packedFile.read()
+            index[name] = [pack.tell(), len(data)]
+            pack.write(data)
+        indexOffset = pack.tell()
+        pack.write(json.dumps(index, sort_keys=True))
+        pack.seek(0)
+        pack.write(HEADER.pack(MAGIC, indexOffset))
+
+
+def packDirectory(directory, packPath, patterns=DEFAULT_PATTERNS):
+    """
+    Pack the files under a directory whose names match any of the patterns.
+
+    Returns the number of files packed: integer
+    """
+    files = []
+    for root, directories, filenames in os.walk(directory):
+        directories.sort()
+        for filename in sorted(filenames):
+            if [x for x in patterns if fnmatch(filename, x)]:
+                path = os.path.join(root, filename)
+                files.append(
+                    (getName(os.path.relpath(path, directory)), path))
+    writePack(packPath, files)
+    return len(files)
+
+
+class AssetPack(object):
+    """
+    An open pack, whose files are read from a memory map of it.
+
+    @param path: the pack file: string
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, indexOffset = HEADER.unpack(self.map[:HEADER.size])
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("%s is not an asset pack." % path)
+        self.index = json.loads(self.map[indexOffset:])
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def glob(self, pattern):
+        """
+        Returns the sorted names of the files matching a glob pattern; as with
+        glob, the wildcards don't match across directories.
+        """
+        depth = pattern.count("/")
+        return sorted([x for x in self.index
+                       if x.count("/") == depth and fnmatch(x, pattern)])
+
+    def read(self, name):
+        """
+        Returns the contents of a file: string
+        """
+        offset, length = self.index[name]
+        return self.map[offset:offset + length]
+
+    def open(self, name):
+        """
+        Returns a file-like object of a file's contents, to load with pygame.
+        """
+        return StringIO(self.read(name))
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def openPack(path):
+    """
+    Open a pack if it has been built, returning None otherwise, so that in
+    development the loose files are used instead.
+    """
+    if not os.path.exists(path):
+        return None
+    return AssetPack(path)
@@ -0,0 +1,125 @@
+import os
+import shutil
+import tempfile
+from random import Random
+from unittest import TestCase
+
+import pygame
+
+from isomyr.skin import AnimatedSkin, Skin
+from isomyr.testing.scenes import TickingWorld
+from isomyr.thing import PhysicalThing
+from isomyr.util.atlas import Atlas, SkylinePacker, buildAtlas
+from isomyr.world.world import Scene
+
+
+class SkylinePackerTestCase(TestCase):
+
+    def test_noOverlaps(self):
+        random = Random(0)
+        packer = SkylinePacker(256, 256)
+        placed = []
+        for index in range(200):
+            rect = pygame.Rect(
+                0, 0, random.randint(4, 40), random.randint(4, 40))
+            position = packer.insert(*rect.size)
+            if position:
+                rect.topleft = position
+                placed.append(rect)
+        self.assertTrue(len(placed) > 50)
+        area = pygame.Rect(0, 0, 256, 256)
+        for index, rect in enumerate(placed):
+            self.assertTrue(area.contains(rect))
+            self.assertEquals(rect.collidelist(placed[index + 1:]), -1)
+
+    def test_full(self):
+        packer = SkylinePacker(20, 10)
+        self.assertEquals(packer.insert(10, 10), (0, 0))
+        self.assertEquals(packer.insert(10, 5), (10, 0))
+        self.assertEquals(packer.insert(10, 5), (10, 5))
+        self.assertEquals(packer.insert(1, 1), None)
+        self.assertEquals(SkylinePacker(20, 10).insert(21, 1), None)
+
+
+class AtlasTestCase(TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((10, 10))
+        random = Random(0)
+        self.images = []
+        for index in range(12):
+            image = pygame.Surface(
+                (random.randint(5, 30), random.randint(5, 30))).convert()
+            image.fill([random.randint(0, 254) for x in range(3)])
+            image.fill((255, 255, 255), (0, 0, 3, 3))
+            image.set_colorkey((255, 255, 255))
+            self.images.append(image)
+        alpha = pygame.Surface((8, 8), pygame.SRCALPHA)
+        alpha.fill((10, 20, 30, 100))
+        self.images.append(alpha)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def draw(self, image):
+        """
+        Draw an image over a grey background, as it would be on the screen.
+        """
+        surface = pygame.Surface((40, 40))
+        surface.fill((128, 128, 128))
+        surface.blit(image, (0, 0))
+        return pygame.image.tostring(surface, "RGB")
+
+    def test_pixels(self):
+        atlas = Atlas((64, 64))
+        atlas.build(self.images)
+        self.assertTrue(1 < len(atlas.pages) < len(self.images))
+        for image in self.images:
+            region = atlas.getRegion(image)
+            self.assertTrue(region.get_parent() in atlas.pages)
+            self.assertEquals(self.draw(region), self.draw(image))
+
+    def test_tooBig(self):
+        atlas = Atlas((16, 16))
+        atlas.build(self.images)
+        big = [x for x in self.images if x.get_width() > 16]
+        self.assertTrue(big)
+        for image in big:
+            self.assertTrue(atlas.getRegion(image) is image)
+
+    def test_layoutFile(self):
+        layoutFile = os.path.join(self.directory, "layout.json")
+        first = Atlas((64, 64))
+        first.build(self.images, layoutFile)
+        self.assertTrue(first.packed)
+        second = Atlas((64, 64))
+        second.build(self.images, layoutFile)
+        self.assertFalse(second.packed)
+        for image in self.images:
+            self.assertEquals(
+                second.getRegion(image).get_abs_offset(),
+                first.getRegion(image).get_abs_offset())
+        # A different set of images is packed again.
+        third = Atlas((64, 64))
+        third.build(self.images[1:], layoutFile)
+        self.assertTrue(third.packed)
+
+    def test_scene(self):
+        scene = Scene(name="room", world=TickingWorld())
+        shared = Skin([self.images[0]])
+        scene.addObjects([
+            PhysicalThing(name="sofa", skin=shared),
+            PhysicalThing(name="chair", skin=Skin([self.images[0]])),
+            PhysicalThing(name="clock", skin=AnimatedSkin(self.images[1:4])),
+            PhysicalThing(name="ghost"),
+            ])
+        atlas = buildAtlas(scene, pageSize=(128, 128))
+        self.assertEquals(len(atlas.pages), 1)
+        sofa = scene.getObject("sofa").skin.getImage()
+        self.assertTrue(sofa.get_parent() is atlas.pages[0])
+        self.assertTrue(scene.getObject("chair").skin.getImage() is sofa)
+        self.assertEquals(
+            [x.get_parent() for x in scene.getObject("clock").skin.images],
+            atlas.pages * 3)
@@ -0,0 +1,194 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+import pygame
+
+from isomyr.skin import AnimatedSkin
+from isomyr.util.loaders import AssetCache, ImageLoader, SpriteSheetLoader
+
+
+class AssetCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.loads = []
+
+    def makeImage(self, name, width):
+        def load():
+            self.loads.append(name)
+            return pygame.Surface((width, 10), 0, 32)
+        return load
+
+    def test_shared(self):
+        cache = AssetCache()
+        first = cache.get("sofa", self.makeImage("sofa", 10))
+        second = cache.get("sofa", self.makeImage("sofa", 10))
+        self.assertTrue(first is second)
+        self.assertEquals(self.loads, ["sofa"])
+        self.assertEquals((cache.hits, cache.misses), (1, 1))
+        self.assertEquals(cache.bytesInUse, 400)
+
+    def test_evict(self):
+        # Room for two 400 byte images.
+        cache = AssetCache(budget=800)
+        cache.get("sofa", self.makeImage("sofa", 10))
+        cache.get("bed", self.makeImage("bed", 10))
+        cache.get("sofa", self.makeImage("sofa", 10))
+        cache.get("lamp", self.makeImage("lamp", 10))
+        self.assertEquals(cache.bytesInUse, 800)
+        # The bed was used least recently.
+        self.assertEquals(list(cache.assets), ["sofa", "lamp"])
+        cache.get("bed", self.makeImage("bed", 10))
+        self.assertEquals(self.loads, ["sofa", "bed", "lamp", "bed"])
+        cache.setBudget(500)
+        self.assertEquals(list(cache.assets), ["bed"])
+        self.assertEquals(cache.bytesInUse, 400)
+
+    def test_overBudget(self):
+        # An asset bigger than the budget is still handed out, and kept until
+        # the next one comes along.
+        cache = AssetCache(budget=100)
+        cache.get("wall", self.makeImage("wall", 100))
+        self.assertEquals(len(cache), 1)
+        cache.get("sofa", self.makeImage("sofa", 10))
+        self.assertEquals(list(cache.assets), ["sofa"])
+
+
+class ImageLoaderTestCase(TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((10, 10))
+        self.directory = tempfile.mkdtemp()
+        pygame.image.save(
+            pygame.Surface((4, 4)), os.path.join(self.directory, "sofa.png"))
+        self.cache = AssetCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_cached(self):
+        loader = ImageLoader(basedir=self.directory, cache=self.cache)
+        first = loader.load("sofa.png")[0]
+        self.assertTrue(loader.load("./sofa.png")[0] is first)
+        # Images with another colorkey are kept apart.
+        keyed = ImageLoader(
+            basedir=self.directory, transparency=(255, 255, 255),
+            cache=self.cache).load("sofa.png")[0]
+        self.assertFalse(keyed is first)
+        self.assertEquals(keyed.get_colorkey(), (255, 255, 255, 255))
+        self.assertEquals((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_listColorkey(self):
+        for transparency in ([255, 255, 255], pygame.Color(255, 255, 255)):
+            loader = ImageLoader(
+                basedir=self.directory, transparency=transparency,
+                cache=self.cache)
+            image = loader.load("sofa.png")[0]
+            self.assertEquals(image.get_colorkey(), (255, 255, 255, 255))
+            self.assertTrue(loader.load("sofa.png")[0] is image)
+
+    def test_uncached(self):
+        loader = ImageLoader(basedir=self.directory, cache=None)
+        first = loader.load("sofa.png")[0]
+        self.assertFalse(loader.load("sofa.png")[0] is first)
+
+    def test_notSharedByDefault(self):
+        # Changing one caller's image in place leaves the others' alone.
+        first = ImageLoader(basedir=self.directory).load("sofa.png")[0]
+        first.fill((255, 0, 0))
+        second = ImageLoader(basedir=self.directory).load("sofa.png")[0]
+        self.assertEquals(second.get_at((0, 0)), (0, 0, 0, 255))
+
+    def test_parallel(self):
+        for index in range(12):
+            image = pygame.Surface((index + 1, 2))
+            pygame.image.save(
+                image, os.path.join(self.directory, "step%02d.png" % index))
+        serial = ImageLoader(basedir=self.directory, cache=None)
+        parallel = ImageLoader(
+            basedir=self.directory, workers=4, transparency=(0, 0, 0),
+            cache=self.cache)
+        expected = [x.get_size() for x in serial.load(fileGlob="step*.png")]
+        threads = threading.active_count()
+        images = parallel.load(fileGlob="step*.png")
+        self.assertEquals([x.get_size() for x in images], expected)
+        # The workers have all finished.
+        self.assertEquals(threading.active_count(), threads)
+        self.assertEquals(images[0].get_colorkey(), (0, 0, 0, 255))
+        # Cached images are not read again.
+        again = parallel.load(fileGlob="step*.png")
+        self.assertEquals(map(id, again), map(id, images))
+        self.assertEquals((self.cache.hits, self.cache.misses), (12, 12))
+
+
+class SpriteSheetLoaderTestCase(TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((10, 10))
+        self.directory = tempfile.mkdtemp()
+        # Three frames across and two down, each 10 by 8, and each a shade of
+        # red.
+        sheet = pygame.Surface((30, 16))
+        for index in range(6):
+            sheet.fill(
+                (index * 40, 0, 0), ((index % 3) * 10, (index / 3) * 8, 10, 8))
+        pygame.image.save(sheet, os.path.join(self.directory, "walk.png"))
+        self.loader = SpriteSheetLoader(
+            basedir=self.directory, cache=AssetCache())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_grid(self):
+        frames = self.loader.loadSheet("walk.png", frameSize=(10, 8))
+        self.assertEquals(len(frames), 6)
+        self.assertEquals(
+            [x.get_at((5, 4))[0] for x in frames], [0, 40, 80, 120, 160, 200])
+        self.assertEquals(frames[4].get_offset(), (10, 8))
+        # The frames are views of the one sheet.
+        sheet = frames[0].get_parent()
+        self.assertTrue(frames[5].get_parent() is sheet)
+        sheet.fill((0, 0, 255), (25, 10, 1, 1))
+        self.assertEquals(frames[5].get_at((5, 2)), (0, 0, 255, 255))
+        self.assertEquals(
+            len(self.loader.loadSheet("walk.png", (10, 8), count=4)), 4)
+        # Skins take the frames like any other images.
+        self.assertTrue(AnimatedSkin(frames).getImage() is frames[0])
+
+    def test_frameFile(self):
+        description = {"frames": [
+            {"x": 20, "y": 8, "w": 10, "h": 8},
+            {"filename": "walk-1", "frame": {"x": 0, "y": 0, "w": 20, "h": 8}},
+            ]}
+        json.dump(
+            description, open(os.path.join(self.directory, "walk.json"), "w"))
+        frames = self.loader.loadSheet("walk.png", frameFile="walk.json")
+        self.assertEquals([x.get_size() for x in frames], [(10, 8), (20, 8)])
+        self.assertEquals(frames[0].get_at((0, 0))[0], 200)
+
+    def test_frameHash(self):
+        # The frames are taken in the order the file gives them, not sorted
+        # by name.
+        with open(os.path.join(self.directory, "walk.json"), "w") as frameFile:
+            frameFile.write(
+                '{"frames": {'
+                '"walk-b": {"frame": {"x": 20, "y": 8, "w": 10, "h": 8}}, '
+                '"walk-a": {"frame": {"x": 0, "y": 0, "w": 20, "h": 8}}}}')
+        frames = self.loader.loadSheet("walk.png", frameFile="walk.json")
+        self.assertEquals([x.get_size() for x in frames], [(10, 8), (20, 8)])
+        self.assertEquals(frames[0].get_at((0, 0))[0], 200)
+
+    def test_badFrameFile(self):
+        json.dump({"frames": 3},
+                  open(os.path.join(self.directory, "walk.json"), "w"))
+        self.assertRaises(
+            ValueError, self.loader.loadSheet, "walk.png",
+            frameFile="walk.json")
+
+    def test_noLayout(self):
+        self.assertRaises(ValueError, self.loader.loadSheet, "walk.png")
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pygame
+
+from isomyr.util.loaders import ImageLoader
+from isomyr.util.pack import AssetPack, openPack, packDirectory
+
+
+class AssetPackTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.assets = os.path.join(self.directory, "assets")
+        os.makedirs(os.path.join(self.assets, "south"))
+        self.files = {
+            "sofa.png": "not really a png",
+            "south/1.gif": "one",
+            "south/2.gif": "two",
+            "notes.txt": "left out",
+            }
+        for name, data in self.files.items():
+            open(os.path.join(self.assets, name), "wb").write(data)
+        self.packPath = os.path.join(self.directory, "assets.pack")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_readBack(self):
+        self.assertEquals(packDirectory(self.assets, self.packPath), 3)
+        pack = AssetPack(self.packPath)
+        self.assertEquals(
+            sorted(pack.index), ["sofa.png", "south/1.gif", "south/2.gif"])
+        for name in pack.index:
+            self.assertEquals(pack.read(name), self.files[name])
+        self.assertEquals(pack.open("south/2.gif").read(), "two")
+        self.assertFalse("notes.txt" in pack)
+        self.assertEquals(pack.glob("*.*"), ["sofa.png"])
+        self.assertEquals(
+            pack.glob("south/*.gif"), ["south/1.gif", "south/2.gif"])
+        pack.close()
+
+    def test_notPack(self):
+        self.assertEquals(openPack(self.packPath), None)
+        self.assertRaises(
+            ValueError, AssetPack, os.path.join(self.assets, "sofa.png"))
+
+
+class PackLoaderTestCase(TestCase):
+
+    def setUp(self):
+        pygame.display.init()
+        pygame.display.set_mode((10, 10))
+        self.directory = tempfile.mkdtemp()
+        for index in range(3):
+            image = pygame.Surface((index + 1, 5))
+            image.fill((index * 50, 0, 0))
+            pygame.image.save(
+                image, os.path.join(self.directory, "step%s.png" % index))
+        self.packPath = os.path.join(self.directory, "steps.pack")
+        packDirectory(self.directory, self.packPath)
+        self.pack = openPack(self.packPath)
+        # Only the pack is shipped.
+        for index in range(3):
+            os.remove(os.path.join(self.directory, "step%s.png" % index))
+
+    def tearDown(self):
+        self.pack.close()
+        shutil.rmtree(self.directory)
+
+    def test_load(self):
+        loader = ImageLoader(
+            basedir=self.directory, pack=self.pack, cache=None)
+        images = loader.load(fileGlob="step*.png")
+        self.assertEquals([x.get_width() for x in images], [1, 2, 3])
+        self.assertEquals(images[2].get_at((0, 0)), (100, 0, 0, 255))
+        self.assertEquals(loader.load("step1.png")[0].get_width(), 2)
+
+    def test_looseFiles(self):
+        # Files that aren't in the pack are loaded from the directory.
+        pygame.image.save(
+            pygame.Surface((7, 7)), os.path.join(self.directory, "new.png"))
+        loader = ImageLoader(
+            basedir=self.directory, pack=self.pack, cache=None)
+        self.assertEquals(loader.load("new.png")[0].get_width(), 7)
+        self.assertEquals(len(loader.load(fileGlob="new*.png")), 1)
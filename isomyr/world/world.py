@@ -4,7 +4,9 @@ import pygame
 from pygame import display
 
 from isomyr import handler
+from isomyr.broadphase import ContactCache, RestIndex
 from isomyr.exceptions import DuplicateObjectError
+from isomyr.isometric import StaticLayer
 from isomyr.objects.character import Player
 from isomyr.thing import ThingOfThings
 from isomyr.world.calendar import Calendar, DateTime, Time
@@ -101,6 +103,10 @@ class Scene(ThingOfThings):
         self.latitude = latitude
         self.altitude = altitude
         self.view = None
+        self.broadphase = None
+        self.restIndex = RestIndex()
+        self.contactCache = ContactCache()
+        self.staticLayer = StaticLayer()
 
     # XXX move into common base class with Thing... something like
     # SkinableMixin.
@@ -133,6 +139,48 @@ class Scene(ThingOfThings):
     def getView(self):
         return self.view
 
+    def setBroadphase(self, broadphase):
+        """
+        Choose the broadphase (see isomyr.broadphase) used to find the object
+        pairs to test for collisions and touches in this scene. Broadphases
+        such as SweepAndPrune keep state between ticks, so each scene should
+        be given its own instance.
+        """
+        self.broadphase = broadphase
+
+    def getBroadphase(self):
+        return self.broadphase
+
+    def setRestIndex(self, restIndex):
+        """
+        Set the index that tracks which objects in this scene are resting, or
+        None to test every pair of objects on every tick.
+        """
+        self.restIndex = restIndex
+
+    def getRestIndex(self):
+        return self.restIndex
+
+    def setContactCache(self, contactCache):
+        """
+        Set the cache that keeps the touching pairs of objects in this scene
+        between ticks, or None to touch test every pair on every tick.
+        """
+        self.contactCache = contactCache
+
+    def getContactCache(self):
+        return self.contactCache
+
+    def setStaticLayer(self, staticLayer):
+        """
+        Set the layer that keeps the background and the fixed objects of this
+        scene drawn between frames, or None to draw every object on its own.
+        """
+        self.staticLayer = staticLayer
+
+    def getStaticLayer(self):
+        return self.staticLayer
+
     def addObject(self, objectInstance):
         super(Scene, self).addObject(objectInstance)
         objectInstance.world = self.world